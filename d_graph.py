@@ -1,329 +1,1889 @@
 import heapq
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
 from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from numbers import Integral
 
-class DirectedGraph:
+import graph_io
+import graph_kernels
+from graph_mixins import CachedQueries, ChangeLog, VisitMarks
+from frozen_graph import FrozenGraph
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class DirectedGraph(VisitMarks, CachedQueries, ChangeLog):
     """
     Class to implement directed weighted graph
     - duplicate edges not allowed
     - loops not allowed
     - only positive edge weights
     - vertex names are integers
+    - edges stored in a dense adjacency matrix, or in compressed sparse row
+      (CSR) arrays when constructed with sparse=True
+    - the dense matrix is a NumPy array when constructed with a dtype
+    - removed vertices leave tombstoned indices until compact() is called
     """
 
-    def __init__(self, start_edges=None):
+    # Minimum fraction of possible edges for which all_pairs_shortest_paths()
+    # prefers Floyd-Warshall
+    DENSE_FRACTION = 0.05
+
+    # Magic number of files written by save()
+    MAGIC = b'DGR1'
+
+    def __init__(self, start_edges=None, sparse=False, dtype=None):
+        """
+        Store graph info as adjacency matrix. If sparse is True, store graph
+        info as CSR arrays instead: outgoing edges of vertex i occupy
+        positions offsets[i] to offsets[i + 1] of the targets and weights
+        arrays, sorted by destination index. If a NumPy dtype such as int32
+        or float32 is given, the adjacency matrix is a NumPy array of that
+        type instead of a list of lists. Integer types reject fractional
+        weights rather than truncate them.
+        """
+        if dtype is not None and np is None:
+            raise ImportError('NumPy adjacency matrix requires NumPy')
+
+        self.v_count = 0
+        self.sparse = sparse
+        self.dtype = None if sparse or dtype is None else np.dtype(dtype)
+
+        # Indices of removed vertices
+        self._removed = set()
+
+        # Incremented on every change to vertices or edges, so derived data
+        # can tell whether it is stale
+        self._version = 0
+
+        # Reversed CSR arrays (offsets, sources, weights), built on demand
+        self._reverse = None
+
+        # Visited marks handed out to traversals, see _take_marks()
+        self._marks = []
+
+        # Latest snapshot published by freeze()
+        self.snapshot = None
+
+        # Query results of the current version, see enable_cache()
+        self._cache = None
+
+        # Functions called with lists of added and removed edges, and the
+        # change log and nesting depth of running batch() blocks
+        self._subscribers = []
+        self._log = None
+        self._depth = 0
+
+        # Precomputed landmark distances, see build_landmarks()
+        self._landmarks = None
+
+        # Topological order maintained across edge updates: _order lists
+        # vertices by position and _ord maps each vertex to its position.
+        # _acyclic is None when the order has to be recomputed
+        self._acyclic = None
+        self._order = None
+        self._ord = None
+
+        if sparse:
+            self._offsets = array('q', [0])
+            self._targets = array('q')
+            self._weights = array('q')
+
+            # Rows changed since the CSR arrays were last rebuilt, mapping a
+            # vertex to sorted (targets, weights) lists, see _edit_row()
+            self._rows = dict()
+
+            # Removed vertices whose incoming edges are still stored in the
+            # rows of other vertices, until the next _pack() drops them
+            self._dangling = set()
+        else:
+            # Matrix is allocated with spare rows and columns; only the first
+            # v_count of each are in use, see the adj_matrix property
+            self._matrix = [] if self.dtype is None else np.zeros((0, 0), self.dtype)
+            self._capacity = 0
+
+        # populate graph with initial vertices and edges (if provided) in a
+        # single streaming pass. The graph has at least one vertex
+        if start_edges is not None:
+            self.add_vertices(1)
+            self.ingest(start_edges)
+
+    def __str__(self):
+        """
+        Return content of the graph in human-readable form
+        """
+        if self.v_count == 0:
+            return 'EMPTY GRAPH\n'
+        out = '   |'
+        out += ' '.join(['{:2}'.format(i) for i in range(self.v_count)]) + '\n'
+        out += '-' * (self.v_count * 3 + 3) + '\n'
+        for i in range(self.v_count):
+            row = self._row(i)
+            out += '{:2} |'.format(i)
+            out += ' '.join(['{:2}'.format(w) for w in row]) + '\n'
+        out = f"GRAPH ({self.v_count} vertices):\n{out}"
+        return out
+
+    # ------------------------------------------------------------------ #
+
+    @classmethod
+    def from_edges(cls, edges, sparse=False, rejected=None, dtype=None):
+        """
+        Builds a graph from an iterable of (src, dst[, weight]) rows, a NumPy
+        array with two or three columns, or the path of a CSV/TSV file, in a
+        single pass. The graph gets one vertex per index up to the largest
+        index used by a valid edge. Rows that add_edge would ignore, or that
+        cannot be parsed, are skipped; if rejected is a list, a (row number,
+        row) tuple is appended to it for each of them.
+        """
+        graph = cls(sparse=sparse, dtype=dtype)
+        v_count, src, dst, weight = graph_io.read_weighted_edges(
+            edges, rejected, graph._weight_type(), integral=graph._integral())
+        graph.add_vertices(v_count)
+
+        if sparse:
+            graph._build_csr(src, dst, weight)
+        elif graph.dtype is not None:
+            graph._matrix[src, dst] = weight
+        else:
+            for u, v, w in zip(src, dst, weight):
+                graph._matrix[u][v] = w
+
+        return graph
+
+
+    def _build_csr(self, src, dst, weight) -> None:
+        """
+        Helper method for bulk loading. Replaces all edges of the graph with
+        the provided valid, duplicate-free edges, which must be sorted by
+        (src, dst), in a single pass.
+        """
+        counts = [0] * (self.v_count + 1)
+        for u in src:
+            counts[u + 1] += 1
+
+        # Running sum of out-degrees gives each row's starting offset
+        for i in range(self.v_count):
+            counts[i + 1] += counts[i]
+
+        self._offsets = array('q', counts)
+        self._targets = array('q', dst)
+        self._weights = array('q')
+        self._fit_weights(weight)
+        self._weights.extend(weight)
+        self._changed()
+
+
+    def _weight_type(self) -> type:
+        """
+        Returns the function used to parse weights read from files: float for
+        floating-point NumPy matrices, which keep fractional weights, and int
+        otherwise.
+        """
+        return float if self.dtype is not None and self.dtype.kind == 'f' else int
+
+
+    def _integral(self) -> bool:
+        """
+        Returns True if the graph stores weights in an integer NumPy matrix,
+        which would truncate fractional weights.
+        """
+        return self.dtype is not None and self.dtype.kind in 'iu'
+
+
+    def ingest(self, source, chunk_size=65536, rejected=None) -> None:
+        """
+        Adds the edges of a stream of (src, dst[, weight]) rows to the graph.
+        Source may be any iterable of rows, a NumPy array, the path of a
+        CSV/TSV file or a file opened in text mode. Rows are parsed and
+        applied chunk_size at a time, so memory use does not grow with the
+        length of the stream. The graph grows to include every vertex index
+        named by a row. Rows that add_edge would ignore, or that cannot be
+        parsed, are skipped; if rejected is a list, a (row number, row) tuple
+        is appended to it for each of them.
+        """
+        rows = graph_io.iter_weighted_rows(source, rejected, self._weight_type())
+        integral = self._integral()
+
+        for chunk in graph_io.chunks(rows, chunk_size):
+            self.add_vertices(max(max(u, v) for _, u, v, _ in chunk) + 1 - self.v_count)
+
+            # Later rows for the same edge replace earlier ones
+            edges = dict()
+
+            for i, u, v, w in chunk:
+                if (u < 0 or v < 0 or u == v or w < 1 or u in self._removed or v in self._removed
+                        or (integral and not float(w).is_integer())):
+                    if rejected is not None:
+                        rejected.append((i, (u, v, w)))
+                    continue
+
+                edges[(u, v)] = w
+
+            self._record(*self._merge_edges(edges))
+
+
+    def _merge_edges(self, edges) -> tuple:
+        """
+        Helper method for ingest and batch. Applies a dict mapping (src, dst)
+        pairs of existing vertices to valid weights, or to 0 to remove the
+        edge, in a single pass over a sparse graph. Returns a tuple of lists
+        of the (src, dst, weight) edges added and removed; an edge whose
+        weight changes is in both.
+        """
+        added, removed = [], []
+        changes = dict()
+
+        for (u, v), w in edges.items():
+            old = self._weight(u, v)
+
+            if old != w:
+                changes[(u, v)] = w
+
+                if old != 0:
+                    removed.append((u, v, old))
+                if w != 0:
+                    added.append((u, v, w))
+
+        if len(changes) == 0:
+            return added, removed
+
+        self._changed()
+
+        # New edges may invalidate the topological order, and removed edges
+        # may break the last cycle
+        if (self._acyclic and len(added) > 0) or (self._acyclic is False and len(removed) > 0):
+            self._acyclic = None
+
+        if self.dtype is not None:
+            keys = list(changes)
+            self._matrix[[u for u, _ in keys], [v for _, v in keys]] = list(changes.values())
+            return added, removed
+
+        if not self.sparse:
+            for (u, v), w in changes.items():
+                self._matrix[u][v] = w
+            return added, removed
+
+        self._pack()
+        self._own_csr()
+        self._fit_weights(w for _, _, w in added)
+
+        rows = dict()
+        for (u, v), w in changes.items():
+            rows.setdefault(u, dict())[v] = w
+
+        offsets, targets = array('q', [0]), array('q')
+        weights = array(self._weights.typecode)
+
+        for u in range(self.v_count):
+            lo, hi = self._offsets[u], self._offsets[u + 1]
+
+            # Merge changes into the row, keeping it sorted by destination
+            # and dropping removed edges. Other rows are copied as they are
+            if u in rows:
+                row = dict(zip(self._targets[lo:hi], self._weights[lo:hi]))
+                row.update(rows[u])
+
+                for v in sorted(row):
+                    if row[v] != 0:
+                        targets.append(v)
+                        weights.append(row[v])
+            else:
+                targets.extend(self._targets[lo:hi])
+                weights.extend(self._weights[lo:hi])
+
+            offsets.append(len(targets))
+
+        self._offsets, self._targets, self._weights = offsets, targets, weights
+
+        return added, removed
+
+
+    def _current_edge(self, key):
+        """
+        Returns the (src, dst, weight) edge for a (src, dst) key of the change
+        log, or None if there is no such edge.
+        """
+        src, dst = key
+
+        if not (0 <= src < self.v_count and 0 <= dst < self.v_count):
+            return None
+
+        weight = self._weight(src, dst)
+
+        return None if weight == 0 else (src, dst, weight)
+
+
+    def export(self, target, delimiter=None) -> int:
+        """
+        Writes the edges of the graph to target, a path or a file opened in
+        text mode, as (src, dst, weight) CSV/TSV rows that ingest() and
+        from_edges() can read back. Edges are generated and written one at a
+        time. Returns the number of edges written.
+        """
+        return graph_io.write_edges(target, self.iter_edges(), delimiter)
+
+
+    def save(self, path) -> None:
+        """
+        Writes the graph to a binary file: a magic number, a header with the
+        weight typecode, vertex count, edge count and number of removed
+        vertices, then the CSR offsets, targets and weights arrays and the
+        indices of removed vertices. All values are little-endian and 8-byte
+        aligned, so load() can map the arrays straight from the file. The
+        file is written under a temporary name and then moved into place, so
+        a graph mapped from path can be saved back to it.
+        """
+        offsets, targets, weights = self._csr_arrays()
+        typecode = memoryview(weights).format
+
+        with graph_io.replace_file(path) as file:
+            file.write(self.MAGIC)
+            file.write(struct.pack('<c3xqqq', typecode.encode(), self.v_count,
+                                   len(targets), len(self._removed)))
+
+            for values in (offsets, targets, weights, array('q', sorted(self._removed))):
+                graph_io.write_array(file, values)
+
+
+    @classmethod
+    def load(cls, path, mmap=True) -> 'DirectedGraph':
+        """
+        Reads a graph written by save() into a sparse graph. If mmap is True,
+        the CSR arrays are memory-mapped read-only instead of read, so loading
+        takes constant time, pages are only read from disk when accessed, and
+        processes loading the same file share them. Mapped arrays are copied
+        on the first change to the graph.
+        """
+        buffer = graph_io.open_buffer(path, mmap)
+        header = struct.Struct('<c3xqqq')
+
+        if bytes(buffer[:len(cls.MAGIC)]) != cls.MAGIC:
+            raise ValueError(f'{path} is not a graph file')
+
+        typecode, v_count, e_count, r_count = header.unpack_from(buffer, len(cls.MAGIC))
+        pos = len(cls.MAGIC) + header.size
+        copy = not mmap
+
+        graph = cls(sparse=True)
+        graph._offsets, pos = graph_io.buffer_array(buffer, pos, 'q', v_count + 1, copy)
+        graph._targets, pos = graph_io.buffer_array(buffer, pos, 'q', e_count, copy)
+        graph._weights, pos = graph_io.buffer_array(buffer, pos, typecode.decode(), e_count, copy)
+        removed, pos = graph_io.buffer_array(buffer, pos, 'q', r_count, copy)
+
+        graph.v_count = v_count
+        graph._removed = set(removed)
+
+        return graph
+
+
+    @property
+    def adj_matrix(self):
+        """
+        Returns a read-only view of the adjacency matrix of a dense graph with
+        v_count rows and columns, leaving out spare capacity: a NumPy array
+        view for NumPy matrices, and a MatrixView otherwise. Use add_edge()
+        and remove_edge() to change the graph.
+        """
+        if self.sparse:
+            raise AttributeError('sparse graphs have no adjacency matrix')
+
+        if self.dtype is not None:
+            view = self._matrix[:self.v_count, :self.v_count]
+            view.flags.writeable = False
+            return view
+
+        return MatrixView(self._matrix, self.v_count)
+
+
+    def _own_csr(self) -> None:
+        """
+        Helper method for changes to a sparse graph. Replaces CSR arrays that
+        load() mapped from a file with writable copies.
+        """
+        if isinstance(self._offsets, memoryview):
+            for name in ('_offsets', '_targets', '_weights'):
+                values = getattr(self, name)
+                copy = array(values.format)
+                copy.frombytes(values.cast('B'))
+                setattr(self, name, copy)
+
+
+    def _edit_row(self, vertex: int) -> tuple:
+        """
+        Helper method for changes to a sparse graph. Returns the (targets,
+        weights) lists of the outgoing edges of a vertex for changing them in
+        place, copying them out of the CSR arrays on the first change. The
+        arrays are brought up to date by _pack() when they are next read as a
+        whole, so no other row has to move.
+        """
+        row = self._rows.get(vertex)
+
+        if row is None:
+            lo, hi = self._offsets[vertex], self._offsets[vertex + 1]
+            row = self._rows[vertex] = (list(self._targets[lo:hi]), list(self._weights[lo:hi]))
+
+        return row
+
+
+    def _pack(self) -> None:
+        """
+        Helper method for the CSR representation. Merges the rows changed by
+        _edit_row() back into the CSR arrays in a single pass. Runs of
+        unchanged rows are copied with slice operations.
+        """
+        if len(self._dangling) > 0:
+            self._drop_dangling()
+
+        if len(self._rows) == 0:
+            return
+
+        self._own_csr()
+        rows, self._rows = self._rows, dict()
+        self._fit_weights(w for _, row_weights in rows.values() for w in row_weights)
+
+        old_offsets, old_targets, old_weights = self._offsets, self._targets, self._weights
+        offsets, targets = array('q', [0]), array('q')
+        weights = array(old_weights.typecode)
+
+        # Change in the number of edges of the rows merged so far
+        shift = 0
+        start = 0
+
+        for u in sorted(rows) + [self.v_count]:
+
+            # Copy rows start to u - 1, moving their end offsets by shift
+            targets.extend(old_targets[old_offsets[start]:old_offsets[u]])
+            weights.extend(old_weights[old_offsets[start]:old_offsets[u]])
+            ends = old_offsets[start + 1:u + 1]
+            offsets.extend(ends if shift == 0 else array('q', map(shift.__add__, ends)))
+
+            if u == self.v_count:
+                break
+
+            row_targets, row_weights = rows[u]
+            targets.extend(row_targets)
+            weights.extend(row_weights)
+            offsets.append(len(targets))
+
+            shift += len(row_targets) - (old_offsets[u + 1] - old_offsets[u])
+            start = u + 1
+
+        self._offsets, self._targets, self._weights = offsets, targets, weights
+
+
+    def _drop_dangling(self) -> None:
+        """
+        Helper method for _pack. Drops the incoming edges of removed vertices
+        from the CSR arrays and from the changed rows in a single pass.
+        """
+        self._own_csr()
+        dangling, self._dangling = self._dangling, set()
+
+        offsets, targets = array('q', [0]), array('q')
+        weights = array(memoryview(self._weights).format)
+
+        for u in range(self.v_count):
+            for pos in range(self._offsets[u], self._offsets[u + 1]):
+                if self._targets[pos] not in dangling:
+                    targets.append(self._targets[pos])
+                    weights.append(self._weights[pos])
+
+            offsets.append(len(targets))
+
+        self._offsets, self._targets, self._weights = offsets, targets, weights
+
+        for u, (row_targets, row_weights) in self._rows.items():
+            keep = [i for i, v in enumerate(row_targets) if v not in dangling]
+
+            if len(keep) < len(row_targets):
+                self._rows[u] = ([row_targets[i] for i in keep], [row_weights[i] for i in keep])
+
+
+    def _fit_weights(self, weights) -> None:
+        """
+        Helper method for the CSR representation. Converts an integer weights
+        array to floating point if any of the provided weights is not an
+        integer, so fractional weights are kept as the dense matrix keeps
+        them.
+        """
+        if self._weights.typecode not in 'fd' and not all(isinstance(w, Integral) for w in weights):
+            self._weights = array('d', self._weights)
+
+
+    def _find(self, src: int, dst: int) -> int:
+        """
+        Helper method for the CSR representation. Returns the position of the
+        edge (src, dst) in the targets array, or -1 if there is no such edge.
+        """
+        lo, hi = self._offsets[src], self._offsets[src + 1]
+        pos = bisect_left(self._targets, dst, lo, hi)
+
+        if pos < hi and self._targets[pos] == dst:
+            return pos
+
+        return -1
+
+
+    def _neighbors(self, vertex: int) -> []:
+        """
+        Returns a list of (destination, weight) tuples for all outgoing edges
+        of a vertex, in ascending order of destination index.
+        """
+        if self.sparse:
+            if vertex in self._rows:
+                edges = zip(*self._rows[vertex])
+            else:
+                lo, hi = self._offsets[vertex], self._offsets[vertex + 1]
+                edges = zip(self._targets[lo:hi], self._weights[lo:hi])
+
+            # Skip edges into removed vertices that _pack() has not dropped
+            if len(self._dangling) > 0:
+                return [(v, w) for v, w in edges if v not in self._dangling]
+
+            return list(edges)
+
+        if self.dtype is not None:
+            return self._nonzero(self._matrix[vertex, :self.v_count])
+
+        return [(i, w) for i, w in enumerate(self._matrix[vertex]) if w != 0]
+
+
+    def _in_neighbors(self, vertex: int) -> []:
+        """
+        Returns a list of (source, weight) tuples for all incoming edges of a
+        vertex, in ascending order of source index.
+        """
+        if self.dtype is not None:
+            return self._nonzero(self._matrix[:self.v_count, vertex])
+
+        if not self.sparse:
+            return [(i, self._matrix[i][vertex]) for i in range(self.v_count)
+                    if self._matrix[i][vertex] != 0]
+
+        if self._reverse is None:
+            self._reverse = self._build_reverse()
+
+        offsets, sources, weights = self._reverse
+        lo, hi = offsets[vertex], offsets[vertex + 1]
+
+        return list(zip(sources[lo:hi], weights[lo:hi]))
+
+
+    def _build_reverse(self) -> tuple:
+        """
+        Helper method for _in_neighbors. Builds CSR arrays of the graph with
+        all edges reversed.
+        """
+        self._pack()
+
+        counts = [0] * (self.v_count + 1)
+        for v in self._targets:
+            counts[v + 1] += 1
+
+        for i in range(self.v_count):
+            counts[i + 1] += counts[i]
+
+        sources = array('q', [0] * len(self._targets))
+        weights = array(memoryview(self._weights).format, [0] * len(self._targets))
+        pos = counts[:-1]
+
+        # Visiting sources in ascending order keeps each reversed row sorted
+        for u in range(self.v_count):
+            for i in range(self._offsets[u], self._offsets[u + 1]):
+                v = self._targets[i]
+                sources[pos[v]] = u
+                weights[pos[v]] = self._weights[i]
+                pos[v] += 1
+
+        return array('q', counts), sources, weights
+
+
+    @staticmethod
+    def _nonzero(weights) -> []:
+        """
+        Returns a list of (index, weight) tuples for the non-zero entries of a
+        NumPy matrix row or column.
+        """
+        indices = np.flatnonzero(weights)
+
+        return list(zip(indices.tolist(), weights[indices].tolist()))
+
+
+    def _weight(self, src: int, dst: int) -> int:
+        """
+        Returns the weight of the edge (src, dst), or 0 if there is no edge.
+        """
+        if self.sparse:
+            if dst in self._dangling:
+                return 0
+
+            if src in self._rows:
+                targets, weights = self._rows[src]
+                pos = bisect_left(targets, dst)
+                return weights[pos] if pos < len(targets) and targets[pos] == dst else 0
+
+            pos = self._find(src, dst)
+            return 0 if pos == -1 else self._weights[pos]
+
+        if self.dtype is not None:
+            return self._matrix[src, dst].item()
+
+        return self._matrix[src][dst]
+
+
+    def _row(self, vertex: int) -> []:
+        """
+        Returns the adjacency matrix row of a vertex as a list of weights.
+        """
+        if self.dtype is not None:
+            return self._matrix[vertex, :self.v_count].tolist()
+
+        if not self.sparse:
+            return self._matrix[vertex][:self.v_count]
+
+        row = [0] * self.v_count
+        for dst, weight in self._neighbors(vertex):
+            row[dst] = weight
+
+        return row
+
+
+    def _changed(self) -> None:
+        """
+        Records a change to the vertices or edges of the graph and drops data
+        derived from the previous state.
+        """
+        self._version += 1
+        self._reverse = None
+
+
+    def _id_count(self) -> int:
+        """
+        Returns the number of vertex indices, including tombstoned ones.
+        """
+        return self.v_count
+
+
+    def _grow(self, capacity: int) -> None:
+        """
+        Helper method for add_vertices. Resizes the adjacency matrix so that it
+        can hold capacity vertices without further reallocation.
+        """
+        if self.dtype is not None:
+            matrix = np.zeros((capacity, capacity), self.dtype)
+            matrix[:self._capacity, :self._capacity] = self._matrix
+            self._matrix = matrix
+            self._capacity = capacity
+            return
+
+        padding = [0] * (capacity - self._capacity)
+
+        # Add columns to existing rows
+        for row in self._matrix:
+            row.extend(padding)
+
+        # Add rows
+        for _ in range(capacity - self._capacity):
+            self._matrix.append([0] * capacity)
+
+        self._capacity = capacity
+
+
+    def add_vertex(self) -> int:
+        """
+        Adds a new vertex to the graph and returns the number of vertices in
+        in the graph after the addition.
+        """
+        return self.add_vertices(1)
+
+
+    def add_vertices(self, count: int) -> int:
+        """
+        Adds count new vertices to the graph and returns the number of vertices
+        in the graph after the addition. The adjacency matrix doubles its
+        capacity whenever it runs out of room, so adding vertices one at a time
+        costs amortized O(1) row operations.
+        """
+        if count < 1:
+            return self.v_count
+
+        self._changed()
+
+        # Add empty rows to CSR offsets
+        if self.sparse:
+            self._own_csr()
+            self._offsets.extend([self._offsets[-1]] * count)
+            self._extend_order(count)
+            self.v_count += count
+            return self.v_count
+
+        if self.v_count + count > self._capacity:
+            self._grow(max(self.v_count + count, 2 * self._capacity))
+
+        self._extend_order(count)
+        self.v_count += count
+
+        return self.v_count
+
+
+    def add_edge(self, src: int, dst: int, weight=1) -> None:
+        """
+        Adds a new edge to the graph, connecting two vertices with the provided
+        indices. If either (or both) vertex indices do not exist in the graph,
+        or if the weight is below 1, or fractional while the graph has an
+        integer dtype, or if src and dst refer to the same vertex, does
+        nothing. If an edge already exists in the graph,
+        the method updates its weight. On a sparse graph, only the outgoing
+        edges of src are copied and changed, in O(out-degree) time; the CSR
+        arrays are rebuilt in one O(V + E) pass when they are next read as a
+        whole, e.g. by save() or freeze(), with or without NumPy.
+        """
+        # Vertex indices not in graph
+        if src < 0 or dst < 0 or src > self.v_count - 1 or dst > self.v_count - 1:
+            return
+
+        # Either vertex has been removed
+        if src in self._removed or dst in self._removed:
+            return
+
+        # Source and destination refer to the same vertex
+        if src == dst:
+            return
+
+        # Weight is not positive, or would be truncated by an integer matrix
+        if weight < 1 or (self._integral() and not float(weight).is_integer()):
+            return
+
+        old = self._weight(src, dst)
+
+        # Re-adding an edge with its current weight changes nothing
+        if old == weight:
+            return
+
+        self._changed()
+
+        # Keep topological order up to date when a new edge is inserted
+        if self._acyclic and old == 0:
+            self._insert_order(src, dst)
+
+        if not self.sparse:
+            self._matrix[src][dst] = weight
+        else:
+            targets, weights = self._edit_row(src)
+            pos = bisect_left(targets, dst)
+
+            # Rows of a floating-point weights array hold floats too
+            if memoryview(self._weights).format in 'fd':
+                weight = float(weight)
+
+            # Update weight in place if edge already exists, otherwise insert
+            # edge in sorted position
+            if pos < len(targets) and targets[pos] == dst:
+                weights[pos] = weight
+            else:
+                targets.insert(pos, dst)
+                weights.insert(pos, weight)
+
+        self._record([(src, dst, weight)], [] if old == 0 else [(src, dst, old)])
+
+
+    def remove_edge(self, src: int, dst: int) -> None:
+        """
+        Removes an edge between the two parameterized vertices. If either (or
+        both) vertex indices do not exist in the graph, or if there is no edge
+        between them, does nothing.
+        """
+        # Vertex indices not in graph
+        if src < 0 or dst < 0 or src > self.v_count - 1 or dst > self.v_count - 1:
+            return
+
+        # No edge between the vertices
+        old = self._weight(src, dst)
+        if old == 0:
+            return
+
+        self._changed()
+
+        # Removing an edge keeps a topological order valid, but may break
+        # the last cycle in the graph
+        if self._acyclic is False:
+            self._acyclic = None
+
+        if not self.sparse:
+            self._matrix[src][dst] = 0
+        else:
+            targets, weights = self._edit_row(src)
+            pos = bisect_left(targets, dst)
+            del targets[pos]
+            del weights[pos]
+
+        self._record([], [(src, dst, old)])
+
+
+    def remove_vertex(self, v: int) -> None:
+        """
+        Removes a vertex and all edges connected to it. The index of the
+        removed vertex becomes a tombstone so that all other vertices keep
+        their indices; call compact() to reclaim it. If the vertex does not
+        exist, does nothing.
+        """
+        self.remove_vertices([v])
+
+
+    def remove_vertices(self, vertices) -> None:
+        """
+        Removes all provided vertices and their connected edges, tombstoning
+        their indices. Vertex indices that do not exist in the graph are
+        ignored. A dense graph is updated in a single pass over the matrix. A
+        sparse graph only clears the rows of the removed vertices; their
+        incoming edges are hidden right away and dropped from the CSR arrays
+        the next time they are rebuilt.
+        """
+        removed = {v for v in vertices if 0 <= v < self.v_count and v not in self._removed}
+
+        if len(removed) == 0:
+            return
+
+        # Collect all edges of removed vertices for the change log
+        lost = []
+        if self._log is not None or len(self._subscribers) > 0:
+            lost = [(u, v, w) for u in removed for v, w in self._neighbors(u)]
+            lost += [(u, v, w) for v in removed for u, w in self._in_neighbors(v) if u not in removed]
+
+        self._removed |= removed
+        self._changed()
+
+        if self._acyclic is False:
+            self._acyclic = None
+
+        if self.dtype is not None:
+            indices = list(removed)
+            self._matrix[indices, :] = 0
+            self._matrix[:, indices] = 0
+
+        elif not self.sparse:
+            zeros = [0] * self._capacity
+
+            for i in range(self.v_count):
+
+                # Clear rows of removed vertices and their columns in all
+                # other rows
+                if i in removed:
+                    self._matrix[i][:] = zeros
+                else:
+                    row = self._matrix[i]
+                    for v in removed:
+                        row[v] = 0
+
+        else:
+            for u in removed:
+                self._rows[u] = ([], [])
+
+            self._dangling |= removed
+
+        self._record([], lost)
+
+
+    def compact(self) -> dict:
+        """
+        Renumbers the remaining vertices to close the gaps left by removed
+        vertices, preserving their relative order, and releases the storage
+        of removed vertices. Returns a dict mapping each old vertex index to
+        its new index. Subscribers are told that every renumbered edge was
+        removed under its old indices and added under its new ones. Raises
+        RuntimeError inside a batch() block, whose change log identifies
+        edges by the old indices.
+        """
+        if self._depth > 0:
+            raise RuntimeError('compact() cannot be called inside a batch() block')
+
+        live = self.get_vertices()
+        index = {old: new for new, old in enumerate(live)}
+
+        # Edges with a renumbered endpoint, for the change log
+        moved = []
+        if len(self._subscribers) > 0:
+            moved = [(u, v, w) for u, v, w in self.iter_edges() if index[u] != u or index[v] != v]
+
+        if self.sparse:
+            self._pack()
+            offsets, targets = array('q', [0]), array('q')
+            weights = array(memoryview(self._weights).format)
+
+            # Edges of removed vertices are already gone, and renumbering
+            # preserves order, so each row stays sorted
+            for u in live:
+                for pos in range(self._offsets[u], self._offsets[u + 1]):
+                    targets.append(index[self._targets[pos]])
+                    weights.append(self._weights[pos])
+                offsets.append(len(targets))
+
+            self._offsets, self._targets, self._weights = offsets, targets, weights
+        elif self.dtype is not None:
+            self._matrix = self._matrix[np.ix_(live, live)]
+            self._capacity = len(live)
+        else:
+            self._matrix = [[self._matrix[i][j] for j in live] for i in live]
+            self._capacity = len(live)
+
+        self.v_count = len(live)
+        self._removed = set()
+        self._acyclic = None
+        self._changed()
+        self._record([(index[u], index[v], w) for u, v, w in moved], moved)
+
+        return index
+
+
+    def freeze(self) -> FrozenGraph:
+        """
+        Returns an immutable snapshot of the graph, which any number of
+        threads can read without locks while this graph keeps changing. The
+        snapshot is also published as the snapshot attribute in a single
+        assignment, so readers that fetch graph.snapshot always get a
+        complete snapshot. Calls without changes in between return the same
+        snapshot.
+        """
+        if self.snapshot is None or self.snapshot.version != self._version:
+            offsets, targets, weights = self._csr_arrays()
+            self.snapshot = FrozenGraph(offsets, targets, weights, removed=self._removed,
+                                        cyclic=self.has_cycle(), order=self.topological_order(),
+                                        version=self._version)
+
+        return self.snapshot
+
+
+    def get_vertices(self) -> []:
+        """
+        Returns a list of vertices of the graph.
+        """
+        return [x for x in range(self.v_count) if x not in self._removed]
+
+
+    def get_edges(self) -> []:
+        """
+        Returns a list of edges in the graph. Each edge is returned as a tuple
+        of two indcident vertex indices and weight. First element in the tuple
+        refers to the source vertex. Second element in the tuple refers to the
+        destination vertex. Third element in the tuple is the weight of the
+        edge.
+        """
+        # Find all non-zero edges in a single pass over the NumPy matrix
+        if self.dtype is not None:
+            matrix = self._matrix[:self.v_count, :self.v_count]
+            rows, cols = np.nonzero(matrix)
+            return list(zip(rows.tolist(), cols.tolist(), matrix[rows, cols].tolist()))
+
+        return list(self.iter_edges())
+
+
+    def iter_edges(self):
+        """
+        Generator version of get_edges. Yields the edges of the graph one at a
+        time, in the same order, while scanning one row at a time.
+        """
+        # Iterate over rows in matrix
+        for i in range(self.v_count):
+
+            # Yield all non-zero edges
+            for j, weight in self._neighbors(i):
+                yield i, j, weight
+
+
+    def is_valid_path(self, path: []) -> bool:
+        """
+        Takes a list of vertex indices and returns True if the sequence of
+        vertices represents a valid path in the graph. Empty paths are
+        considered valid.
+        """
+        # Empty paths are valid
+        if len(path) == 0:
+            return True
+        
+        for i in range(len(path) - 1):
+
+            # Check whether edge exists between current vertex in the path
+            # and the next
+            if self._weight(path[i], path[i + 1]) == 0:
+                return False
+
+        return True
+
+
+    def dfs(self, v_start, v_end=None) -> []:
+        """
+        Return list of vertices visited during DFS search.
+        Vertices are picked by vertex index in ascending order.
+        """
+        return list(self._cached(('dfs', v_start, v_end),
+                                 lambda: list(self.iter_dfs(v_start, v_end))))
+
+
+    def iter_dfs(self, v_start, v_end=None):
+        """
+        Generator version of dfs. Yields vertices in the order they are
+        visited, so callers can stop after the first few.
+        """
+        if v_start < 0 or v_start > self.v_count - 1 or v_start in self._removed:
+            return
+
+        marks, stamp = self._take_marks()
+
+        try:
+            marks[v_start] = stamp
+            yield v_start
+
+            if v_start == v_end:
+                return
+
+            # Use a stack of neighbor iterators for the vertices on the
+            # current path, so each vertex enters the stack only once. Taking
+            # neighbors in ascending order visits lower indices first
+            stack = [iter(self._neighbors(v_start))]
+
+            while len(stack) > 0:
+
+                for i, _ in stack[-1]:
+
+                    if marks[i] != stamp:
+                        marks[i] = stamp
+                        yield i
+
+                        if i == v_end:
+                            return
+
+                        # Resume the current vertex's neighbors once the
+                        # new vertex has been processed
+                        stack.append(iter(self._neighbors(i)))
+                        break
+
+                else:
+                    stack.pop()
+
+        finally:
+            self._give_marks(marks, stamp)
+
+
+    def bfs(self, v_start, v_end=None) -> []:
+        """
+        Return list of vertices visited during BFS search.
+        Vertices are picked by vertex index in ascending order.
+        """
+        return list(self._cached(('bfs', v_start, v_end),
+                                 lambda: list(self.iter_bfs(v_start, v_end))))
+
+
+    def iter_bfs(self, v_start, v_end=None):
+        """
+        Generator version of bfs. Yields vertices in the order they are
+        visited, so callers can stop after the first few.
+        """
+        if v_start < 0 or v_start > self.v_count - 1 or v_start in self._removed:
+            return
+
+        marks, stamp = self._take_marks()
+
+        try:
+            # Use a queue ADT to store neighboring vertices. Vertices are
+            # marked when enqueued, so each one is enqueued only once
+            queue = deque()
+            queue.append(v_start)
+            marks[v_start] = stamp
+
+            while len(queue) > 0:
+
+                current = queue.popleft()
+                yield current
+
+                if current == v_end:
+                    return
+
+                # Enqueue vertices in ascending order
+                for i, _ in self._neighbors(current):
+                    if marks[i] != stamp:
+                        marks[i] = stamp
+                        queue.append(i)
+
+        finally:
+            self._give_marks(marks, stamp)
+
+
+    def multi_source_bfs(self, sources) -> []:
+        """
+        Performs a breadth-first search from all provided source vertices at
+        once and returns one list per source with the number of edges on the
+        shortest path from that source to each vertex, or INFINITY if a
+        vertex is not reachable. Each vertex holds a bitset with one bit per
+        source, so every neighbor scan advances the searches of all sources
+        that reached the vertex in the same step (MS-BFS).
+        """
+        sources = list(sources)
+        res = [[float('inf')] * self.v_count for _ in sources]
+
+        # Bit i of seen[v] is set once source i has reached vertex v, and bit
+        # i of frontier[v] if it reached v in the current step
+        seen = [0] * self.v_count
+        frontier = dict()
+
+        for i, src in enumerate(sources):
+            if self._is_live(src):
+                seen[src] |= 1 << i
+                frontier[src] = frontier.get(src, 0) | 1 << i
+                res[i][src] = 0
+
+        level = 0
+
+        while len(frontier) > 0:
+
+            level += 1
+            next_frontier = dict()
+
+            for vertex, bits in frontier.items():
+                for neighbor, _ in self._neighbors(vertex):
+
+                    # Sources that reach the neighbor for the first time
+                    new = bits & ~seen[neighbor]
+                    if new:
+                        next_frontier[neighbor] = next_frontier.get(neighbor, 0) | new
+
+            for vertex, bits in next_frontier.items():
+                seen[vertex] |= bits
+
+                # Record distance for every source bit that is set
+                while bits:
+                    lowest = bits & -bits
+                    res[lowest.bit_length() - 1][vertex] = level
+                    bits ^= lowest
+
+            frontier = next_frontier
+
+        return res
+
+
+    def has_cycle(self):
+        """
+        Returns True if there is at least one cycle in the graph. If the graph
+        is acyclic, returns False. The answer is maintained across add_edge
+        and remove_edge, so repeated calls do not traverse the graph again.
+        """
+        if self._acyclic is None:
+            self._rebuild_order()
+
+        return not self._acyclic
+
+
+    def topological_order(self) -> []:
+        """
+        Returns a list of all vertices in which every edge leads from an
+        earlier vertex to a later one. If the graph has a cycle, returns an
+        empty list.
+        """
+        if self.has_cycle():
+            return []
+
+        return [v for v in self._order if v not in self._removed]
+
+
+    def _rebuild_order(self) -> None:
         """
-        Store graph info as adjacency matrix
+        Helper method for has_cycle. Recomputes the topological order from
+        scratch, or records that the graph has a cycle.
         """
-        self.v_count = 0
-        self.adj_matrix = []
+        # Place vertices into three possible categories: unprocessed (0),
+        # processing (1), and processed (2) ("white-grey-black coloring
+        # method"). Processed vertices are kept in the order they finished
+        state = bytearray(self.v_count)
+        finished = []
 
-        # populate graph with initial vertices and edges (if provided)
-        # before using, implement add_vertex() and add_edge() methods
-        if start_edges is not None:
-            v_count = 0
-            for u, v, _ in start_edges:
-                v_count = max(v_count, u, v)
-            for _ in range(v_count + 1):
-                self.add_vertex()
-            for u, v, weight in start_edges:
-                self.add_edge(u, v, weight)
+        for vertex in range(self.v_count):
 
-    def __str__(self):
+            if state[vertex] == 0 and self._cycle_search(vertex, state, finished):
+                self._acyclic = False
+                self._order = self._ord = None
+                return
+
+        # Reverse finishing order of a DFS is a topological order
+        self._acyclic = True
+        self._order = list(reversed(finished))
+        self._ord = [0] * self.v_count
+
+        for pos, v in enumerate(self._order):
+            self._ord[v] = pos
+
+    
+    def _cycle_search(self, vertex, state, finished) -> bool:
         """
-        Return content of the graph in human-readable form
+        Helper method for _rebuild_order. Performs a DFS from vertex using an
+        explicit stack of successor iterators instead of recursion, so long
+        paths do not hit the recursion limit. Returns True if a cycle is found.
         """
-        if self.v_count == 0:
-            return 'EMPTY GRAPH\n'
-        out = '   |'
-        out += ' '.join(['{:2}'.format(i) for i in range(self.v_count)]) + '\n'
-        out += '-' * (self.v_count * 3 + 3) + '\n'
-        for i in range(self.v_count):
-            row = self.adj_matrix[i]
-            out += '{:2} |'.format(i)
-            out += ' '.join(['{:2}'.format(w) for w in row]) + '\n'
-        out = f"GRAPH ({self.v_count} vertices):\n{out}"
-        return out
+        # Mark vertex as currently processing
+        state[vertex] = 1
 
-    # ------------------------------------------------------------------ #
+        stack = [(vertex, iter(self._neighbors(vertex)))]
 
-    def add_vertex(self) -> int:
+        while len(stack) > 0:
+
+            current, successors = stack[-1]
+
+            for successor, _ in successors:
+
+                # If we've found a path back to a vertex while it is still
+                # currently being processed, then there is a cycle in the graph
+                if state[successor] == 1:
+                    return True
+
+                # Go to unvisited successor, resuming the current vertex's
+                # successors once it has been processed
+                if state[successor] == 0:
+                    state[successor] = 1
+                    stack.append((successor, iter(self._neighbors(successor))))
+                    break
+
+            else:
+                # We have finished processing a vertex once we have finished
+                # processing all of its children. If we've reached this
+                # point, we can conclude that this vertex is not part of a
+                # cycle.
+                stack.pop()
+                state[current] = 2
+                finished.append(current)
+
+        return False
+
+
+    def _extend_order(self, count: int) -> None:
         """
-        Adds a new vertex to the graph and returns the number of vertices in
-        in the graph after the addition.
+        Helper method for add_vertices. New vertices have no edges, so they
+        can be appended to the end of the topological order.
         """
-        # Add row
-        self.adj_matrix.append([0] * (self.v_count + 1))
-        
-        # Add columns to existing rows, excluding row that was just added
-        for i in range(self.v_count):
-            self.adj_matrix[i].append(0)
+        if self._acyclic:
+            self._order.extend(range(self.v_count, self.v_count + count))
+            self._ord.extend(range(self.v_count, self.v_count + count))
 
-        self.v_count += 1
 
-        return self.v_count
+    def _insert_order(self, src: int, dst: int) -> None:
+        """
+        Helper method for add_edge. Updates the topological order for a new
+        edge (src, dst) by reordering only the vertices placed between dst and
+        src (Marchetti-Spaccamela et al.), or records that the edge closes a
+        cycle.
+        """
+        lower, upper = self._ord[dst], self._ord[src]
+
+        # Order is still valid
+        if upper < lower:
+            return
 
+        # Collect vertices reachable from dst without leaving the region
+        # between dst and src. If src is one of them, the new edge closes
+        # a cycle
+        reached, stamp = self._take_marks()
+        reached[dst] = stamp
+        stack = [dst]
 
-    def add_edge(self, src: int, dst: int, weight=1) -> None:
+        while len(stack) > 0:
+
+            for successor, _ in self._neighbors(stack.pop()):
+
+                if successor == src:
+                    self._give_marks(reached, stamp)
+                    self._acyclic = False
+                    self._order = self._ord = None
+                    return
+
+                if reached[successor] != stamp and self._ord[successor] <= upper:
+                    reached[successor] = stamp
+                    stack.append(successor)
+
+        # Shift the unreached vertices of the region to the front, keeping
+        # their relative order, and move the reached vertices after src
+        region = self._order[lower:upper + 1]
+        region = ([v for v in region if reached[v] != stamp]
+                  + [v for v in region if reached[v] == stamp])
+        self._order[lower:upper + 1] = region
+        self._give_marks(reached, stamp)
+
+        for pos in range(lower, upper + 1):
+            self._ord[self._order[pos]] = pos
+
+
+    def dijkstra(self, src: int, target=None) -> []:
         """
-        Adds a new edge to the graph, connecting two vertices with the provided
-        indices. If either (or both) vertex indices do not exist in the graph,
-        or if the weight is not a positive integer, or if src and dst refer to
-        the same vertex, does nothing. If an edge already exists in the graph,
-        the method updates its weight.
+        Implements the Dijkstra algorithm to compute the length of the shortest
+        path from a given vertex to all other vertices in the graph. Returns a
+        list with one value per each vertex in the graph. If a certain vertex is
+        not reachable from SRC, the returned value is INFINITY. If a target
+        vertex is given, the search stops as soon as the distance to the
+        target is known, and vertices not reached by then are reported as
+        INFINITY.
         """
-        # Vertex indices not in graph
-        if src < 0 or dst < 0 or src > len(self.adj_matrix) - 1 or dst > len(self.adj_matrix) - 1:
-            return
+        return self.shortest_paths(src, target)[0]
 
-        # Source and destination refer to the same vertex
-        if src == dst:
-            return
 
-        # Weight is not a positive integer
-        if weight < 1:
-            return
+    def shortest_paths(self, src: int, target=None) -> tuple:
+        """
+        Implements the Dijkstra algorithm like dijkstra(), and returns a tuple
+        of two lists with one value per each vertex in the graph: the length of
+        the shortest path from SRC, and the vertex preceding it on that path.
+        The predecessor of SRC and of unreachable vertices is None.
+        """
+        distances, predecessors = self._cached(
+            ('dijkstra', src, target), lambda: self._dijkstra(src, target, self._neighbors))
 
-        self.adj_matrix[src][dst] = weight
+        return list(distances), list(predecessors)
 
 
-    def remove_edge(self, src: int, dst: int) -> None:
+    def _dijkstra(self, src: int, target, neighbors) -> tuple:
         """
-        Removes an edge between the two parameterized vertices. If either (or
-        both) vertex indices do not exist in the graph, or if there is no edge
-        between them, does nothing.
+        Helper method for shortest_paths. Follows edges listed by the
+        neighbors function, so passing _in_neighbors computes shortest path
+        lengths to SRC instead of from it.
         """
-        # Vertex indices not in graph
-        if src < 0 or dst < 0 or src > len(self.adj_matrix) - 1 or dst > len(self.adj_matrix) - 1:
-            return
+        distances = [float('inf')] * self.v_count
+        predecessors = [None] * self.v_count
 
-        self.adj_matrix[src][dst] = 0
+        if src < 0 or src > self.v_count - 1 or src in self._removed:
+            return distances, predecessors
 
+        # Vertices whose shortest distance is final
+        settled, stamp = self._take_marks()
+        distances[src] = 0
 
-    def get_vertices(self) -> []:
+        # Use a priority queue to store neighboring vertices
+        priority_queue = [(0, src)]
+
+        while len(priority_queue) > 0:
+
+            # Represents distance to the current vertex
+            distance, current = heapq.heappop(priority_queue)
+
+            # Skip queue entries made obsolete by a shorter path found later
+            if settled[current] == stamp:
+                continue
+
+            settled[current] = stamp
+
+            if current == target:
+                break
+
+            # Insert each neighbor and its associated distance as a tuple
+            # into MinHeap/priority queue, where the closest neighbor gets
+            # sorted to the front of the queue
+            for neighbor, weight in neighbors(current):
+
+                # The neighboring vertex's total distance is the sum of
+                # the current vertex's distance from v0 and the distance
+                # (weight of the edge) to the neighboring vertex. Only
+                # improvements on the best known distance are queued
+                if distance + weight < distances[neighbor]:
+                    distances[neighbor] = distance + weight
+                    predecessors[neighbor] = current
+                    heapq.heappush(priority_queue, (distance + weight, neighbor))
+
+        # Distances of vertices that were reached but not settled before
+        # stopping at the target are not final
+        if len(priority_queue) > 0:
+            for vertex in range(self.v_count):
+                if settled[vertex] != stamp:
+                    distances[vertex] = float('inf')
+                    predecessors[vertex] = None
+
+        self._give_marks(settled, stamp)
+
+        return distances, predecessors
+
+
+    def shortest_path(self, src: int, dst: int) -> []:
         """
-        Returns a list of vertices of the graph.
+        Returns the list of vertices on a shortest path from SRC to DST, or an
+        empty list if DST is not reachable from SRC.
         """
-        return [x for x in range(len(self.adj_matrix))]
+        if dst < 0 or dst > self.v_count - 1:
+            return []
 
+        distances, predecessors = self.shortest_paths(src, dst)
 
-    def get_edges(self) -> []:
+        if distances[dst] == float('inf'):
+            return []
+
+        # Follow predecessors back from the destination
+        path = [dst]
+        while path[-1] != src:
+            path.append(predecessors[path[-1]])
+
+        path.reverse()
+
+        return path
+
+
+    def bidirectional_dijkstra(self, src: int, dst: int):
         """
-        Returns a list of edges in the graph. Each edge is returned as a tuple
-        of two indcident vertex indices and weight. First element in the tuple
-        refers to the source vertex. Second element in the tuple refers to the
-        destination vertex. Third element in the tuple is the weight of the
-        edge.
+        Returns the length of the shortest path from SRC to DST, or INFINITY if
+        DST is not reachable from SRC. Runs Dijkstra's algorithm forward from
+        SRC and backward from DST over reversed edges, always advancing the
+        search with the closer frontier, and stops once the two searches
+        cannot find a shorter connection.
         """
-        res = []
+        if not self._is_live(src) or not self._is_live(dst):
+            return float('inf')
 
-        # Iterate over rows in matrix
-        for i in range(len(self.adj_matrix)):
-            
-            # Iterate over columns in row
-            for j in range(len(self.adj_matrix[i])):
+        # Index 0 holds the forward search, index 1 the backward search
+        distances = ({src: 0}, {dst: 0})
+        settled = (set(), set())
+        queues = ([(0, src)], [(0, dst)])
+        neighbors = (self._neighbors, self._in_neighbors)
 
-                # Add all non-zero edges to result
-                if self.adj_matrix[i][j] != 0:
-                    res.append((i, j, self.adj_matrix[i][j]))
+        best = 0 if src == dst else float('inf')
 
-        return res
+        while len(queues[0]) > 0 and len(queues[1]) > 0:
 
+            # No unsettled pair of vertices can improve on the best path
+            if queues[0][0][0] + queues[1][0][0] >= best:
+                break
 
-    def is_valid_path(self, path: []) -> bool:
+            side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+            distance, current = heapq.heappop(queues[side])
+
+            if current in settled[side]:
+                continue
+
+            settled[side].add(current)
+
+            for neighbor, weight in neighbors[side](current):
+
+                total = distance + weight
+
+                if total < distances[side].get(neighbor, float('inf')):
+                    distances[side][neighbor] = total
+                    heapq.heappush(queues[side], (total, neighbor))
+
+                # Edge connects to a vertex reached by the other search
+                other = distances[1 - side].get(neighbor)
+                if other is not None and total + other < best:
+                    best = total + other
+
+        return best
+
+
+    def astar(self, src: int, dst: int, heuristic=None):
         """
-        Takes a list of vertex indices and returns True if the sequence of
-        vertices represents a valid path in the graph. Empty paths are
-        considered valid.
+        Returns the length of the shortest path from SRC to DST, or INFINITY if
+        DST is not reachable from SRC, using A* search. HEURISTIC is a function
+        that takes a vertex and returns a lower bound on its distance to DST,
+        for example a scaled straight-line distance between vertex
+        coordinates. Without a heuristic the search behaves like dijkstra()
+        with a target.
         """
-        # Empty paths are valid
-        if len(path) == 0:
-            return True
-        
-        for i in range(len(path) - 1):
+        if not self._is_live(src) or not self._is_live(dst):
+            return float('inf')
 
-            # Check whether edge exists between current vertex in the path
-            # and the next
-            if self.adj_matrix[path[i]][path[i + 1]] == 0:
-                return False
+        if heuristic is None:
+            heuristic = lambda vertex: 0
 
-        return True
+        distances = {src: 0}
 
+        # Queue entries are ordered by distance plus estimated remaining
+        # distance to DST
+        priority_queue = [(heuristic(src), 0, src)]
 
-    def dfs(self, v_start, v_end=None) -> []:
+        while len(priority_queue) > 0:
+
+            _, distance, current = heapq.heappop(priority_queue)
+
+            # Skip queue entries made obsolete by a shorter path found later
+            if distance > distances[current]:
+                continue
+
+            if current == dst:
+                return distance
+
+            for neighbor, weight in self._neighbors(current):
+
+                total = distance + weight
+
+                if total < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = total
+                    heapq.heappush(priority_queue, (total + heuristic(neighbor), total, neighbor))
+
+        return float('inf')
+
+
+    def build_landmarks(self, count=8) -> 'LandmarkIndex':
         """
-        Return list of vertices visited during DFS search.
-        Vertices are picked by vertex index in ascending order.
+        Precomputes shortest path lengths from and to COUNT landmark vertices
+        for landmark_distance() queries and returns the resulting index.
+        Landmarks are picked greedily, each one as far as possible from the
+        ones already picked. The index is kept until the graph changes.
         """
-        path = []
+        vertices = self.get_vertices()
+        landmarks, forward, backward = [], [], []
 
-        if v_start < 0 or v_start > len(self.adj_matrix) - 1:
-            return path
+        # Distance from the closest landmark picked so far
+        nearest = {v: float('inf') for v in vertices}
 
-        # Use a stack ADT to store neighboring vertices
-        stack = deque()
-        visited = set()
+        while len(landmarks) < min(count, len(vertices)):
 
-        stack.append(v_start)
+            if len(landmarks) == 0:
+                landmark = vertices[0]
+            else:
+                landmark = max((v for v in vertices if v not in landmarks),
+                               key=lambda v: nearest[v])
 
-        while len(stack) > 0:
+            landmarks.append(landmark)
+            forward.append(array('d', self._dijkstra(landmark, None, self._neighbors)[0]))
+            backward.append(array('d', self._dijkstra(landmark, None, self._in_neighbors)[0]))
 
-            current = stack.pop()
+            for v in vertices:
+                nearest[v] = min(nearest[v], forward[-1][v])
+
+        self._landmarks = LandmarkIndex(landmarks, forward, backward, self._fingerprint())
+        self._landmarks.version = self._version
+
+        return self._landmarks
 
-            if current == v_end:
-                path.append(current)
-                break
 
-            if current not in visited:
+    def save_landmarks(self, path) -> None:
+        """
+        Writes the current landmark index to a binary file, building it first
+        if there is no up to date index.
+        """
+        self._landmark_index().save(path)
 
-                visited.add(current)
-                path.append(current)
 
-                # Push vertices to stack in descending order such that
-                # lower indices are at the top and will be visited first
-                for i in range(len(self.adj_matrix) - 1, -1, -1):
+    def load_landmarks(self, path) -> None:
+        """
+        Reads a landmark index written by save_landmarks() for use by
+        landmark_distance(). Raises ValueError if the index was built for a
+        graph with different edges.
+        """
+        index = LandmarkIndex.load(path)
 
-                    # Add only vertices for which non-zero edge exists
-                    if self.adj_matrix[current][i] != 0:
-                        stack.append(i)
+        if index.fingerprint != self._fingerprint():
+            raise ValueError(f'{path} was built for a different graph')
 
-        return path
+        index.version = self._version
+        self._landmarks = index
 
 
-    def bfs(self, v_start, v_end=None) -> []:
+    def landmark_distance(self, src: int, dst: int):
         """
-        Return list of vertices visited during BFS search.
-        Vertices are picked by vertex index in ascending order.
+        Returns the length of the shortest path from SRC to DST, or INFINITY if
+        DST is not reachable from SRC, using A* search with lower bounds
+        derived from the landmark index (ALT). The index is built on first use.
+        If the graph changed since it was built, the query is answered with
+        bidirectional_dijkstra() instead, so a change does not cost a full
+        rebuild on the next query; call build_landmarks() to refresh it.
         """
-        path = []
+        if not self._is_live(src) or not self._is_live(dst):
+            return float('inf')
 
-        if v_start < 0 or v_start > len(self.adj_matrix) - 1:
-            return path
+        if self._landmarks is None:
+            self.build_landmarks()
+        elif self._landmarks.version != self._version:
+            return self.bidirectional_dijkstra(src, dst)
 
-        # Use a queue ADT to store neighboring vertices
-        queue = deque()
-        visited = set()
+        return self.astar(src, dst, self._landmarks.heuristic(dst))
 
-        queue.append(v_start)
 
-        while len(queue) > 0:
+    def _landmark_index(self) -> 'LandmarkIndex':
+        """
+        Returns the landmark index, rebuilding it if it is missing or stale.
+        """
+        if self._landmarks is None:
+            return self.build_landmarks()
 
-            current = queue.popleft()
+        if self._landmarks.version != self._version:
+            return self.build_landmarks(len(self._landmarks.landmarks))
 
-            if current == v_end:
-                path.append(current)
-                break
+        return self._landmarks
 
-            if current not in visited:
 
-                visited.add(current)
-                path.append(current)
+    def _fingerprint(self) -> int:
+        """
+        Returns a checksum of the vertices and edges of the graph, used to
+        match saved indexes to the graph they were built for.
+        """
+        values = array('d', [self.v_count])
+        for edge in self.get_edges():
+            values.extend(edge)
 
-                # Enqueue vertices in ascending order
-                for i in range(len(self.adj_matrix)):
+        return zlib.crc32(values.tobytes())
 
-                    # Add only vertices for which non-zero edge exists
-                    if self.adj_matrix[current][i] != 0:
-                        queue.append(i)
 
-        return path
+    def all_pairs_shortest_paths(self, strategy=None, workers=None):
+        """
+        Returns the lengths of the shortest paths between all pairs of
+        vertices as a matrix of floats, where entry [i][j] equals
+        dijkstra(i)[j]. The matrix is a NumPy array if NumPy is installed, and
+        a list of array('d') rows otherwise.
+
+        STRATEGY is 'floyd_warshall' (vectorized with NumPy) or 'dijkstra'
+        (run from every vertex on a pool of WORKERS processes that share the
+        adjacency arrays through shared memory, one per CPU by default). If
+        not given, Floyd-Warshall is used for dense graphs when NumPy is
+        installed.
+        """
+        offsets, targets, weights = self._csr_arrays()
 
+        if strategy is None:
+            dense = len(targets) >= self.DENSE_FRACTION * self.v_count ** 2
+            strategy = 'floyd_warshall' if np is not None and dense else 'dijkstra'
 
-    def has_cycle(self):
+        if strategy == 'floyd_warshall':
+            if np is None:
+                raise ImportError('floyd_warshall strategy requires NumPy')
+            return self._floyd_warshall(offsets, targets, weights)
+
+        if strategy != 'dijkstra':
+            raise ValueError(f'unknown strategy {strategy!r}')
+
+        result = array('d', [float('inf')]) * (self.v_count * self.v_count)
+        sources = self.get_vertices()
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers == 1 or len(sources) < 2:
+            for src in sources:
+                row = graph_kernels.dijkstra(offsets, targets, weights, src)
+                result[src * self.v_count:(src + 1) * self.v_count] = array('d', row)
+        else:
+            with graph_kernels.SharedArrays(offsets=offsets, targets=targets,
+                                            weights=weights, result=result) as shared:
+
+                # Several chunks per worker keep the pool busy when some
+                # sources reach more of the graph than others
+                size = max(1, len(sources) // (4 * workers))
+                chunks = [sources[i:i + size] for i in range(0, len(sources), size)]
+
+                with ProcessPoolExecutor(workers, initializer=graph_kernels.attach,
+                                         initargs=(shared.spec,)) as pool:
+                    for _ in pool.map(graph_kernels.dijkstra_rows, chunks):
+                        pass
+
+                view = shared.view('result')
+                result = array('d', view)
+                view.release()
+
+        if np is not None:
+            return np.frombuffer(result, dtype=np.float64).reshape(self.v_count, self.v_count)
+
+        return [result[i * self.v_count:(i + 1) * self.v_count] for i in range(self.v_count)]
+
+
+    def batch_query(self, kind: str, sources, workers=None):
         """
-        Returns True if there is at least one cycle in the graph. If the graph
-        is acyclic, returns False.
+        Generator. Runs bfs(), dfs() or dijkstra() from every vertex in
+        SOURCES, as selected by KIND, on a pool of WORKERS processes that
+        share the adjacency arrays through shared memory (one per CPU by
+        default). Yields (source, result) tuples in the order they complete.
         """
-        # Place vertices into three possible categories: unprocessed,
-        # processing, and processed ("white-grey-black coloring method")
-        unvisited = {x for x in range(len(self.adj_matrix))}
-        visiting = set()
-        visited = set()
+        if kind not in ('bfs', 'dfs', 'dijkstra'):
+            raise ValueError(f'unknown query kind {kind!r}')
 
-        while len(unvisited) > 0:
+        sources = list(sources)
 
-            vertex = unvisited.pop()
+        # Invalid sources are answered locally
+        for src in sources:
+            if not self._is_live(src):
+                yield src, getattr(self, kind)(src)
 
-            if self.has_cycle_rec(vertex, unvisited, visiting, visited):
-                return True
+        offsets, targets, weights = self._csr_arrays()
+        arrays = {'offsets': offsets, 'targets': targets, 'weights': weights}
 
-        return False
+        yield from graph_kernels.batch(arrays, kind, [src for src in sources if self._is_live(src)],
+                                       workers or os.cpu_count() or 1)
 
-    
-    def has_cycle_rec(self, vertex, unvisited, visiting, visited):
+
+    def _floyd_warshall(self, offsets, targets, weights):
         """
-        Recursive helper method for has_cycle.
+        Helper method for all_pairs_shortest_paths. Runs the Floyd-Warshall
+        algorithm with one vectorized NumPy update per intermediate vertex.
         """
-        # Remove vertex from set of unprocessed vertices and add it to
-        # set of currently processing vertices
-        unvisited.discard(vertex)
-        visiting.add(vertex)
+        offsets = np.frombuffer(offsets, dtype=np.int64)
+        sources = np.repeat(np.arange(self.v_count), np.diff(offsets))
 
-        for successor in range(len(self.adj_matrix[vertex])):
+        distances = np.full((self.v_count, self.v_count), np.inf)
+        distances[sources, np.frombuffer(targets, dtype=np.int64)] = np.array(weights)
 
-            if self.adj_matrix[vertex][successor] != 0:
+        live = np.array(self.get_vertices(), dtype=np.int64)
+        distances[live, live] = 0
 
-                # If we've found a path back to a vertex while it is still
-                # currently being processed, then there is a cycle in the graph
-                if successor in visiting:
-                    return True
+        for k in range(self.v_count):
+            np.minimum(distances, distances[:, k, None] + distances[None, k, :], out=distances)
 
-                # Go to unvisited successor
-                if successor not in visited:
+        return distances
 
-                    if self.has_cycle_rec(successor, unvisited, visiting, visited):
-                        return True
-        
-        # We have finished processing a vertex once we have finished processing
-        # all of its children. If we've reached this point, we can conclude that
-        # this vertex is not part of a cycle.
-        visiting.remove(vertex)
-        visited.add(vertex)
-        
-        return False
 
+    def _csr_arrays(self) -> tuple:
+        """
+        Returns the offsets, targets and weights arrays of the graph in CSR
+        form, building them from the adjacency matrix if necessary.
+        """
+        if self.sparse:
+            self._pack()
+            return self._offsets, self._targets, self._weights
+
+        if self.dtype is not None:
+            matrix = self._matrix[:self.v_count, :self.v_count]
+            rows, cols = np.nonzero(matrix)
+            offsets = np.zeros(self.v_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=self.v_count), out=offsets[1:])
+
+            # Float matrices need float weights
+            typecode = 'd' if self.dtype.kind == 'f' else 'q'
+
+            return (array('q', offsets.tobytes()), array('q', cols.astype(np.int64).tobytes()),
+                    array(typecode, matrix[rows, cols].astype(typecode).tobytes()))
+
+        offsets, targets, weights = array('q', [0]), array('q'), []
+
+        for i in range(self.v_count):
+            for j, weight in self._neighbors(i):
+                targets.append(j)
+                weights.append(weight)
+            offsets.append(len(targets))
+
+        # Fractional weights need a floating-point array, as in _fit_weights
+        typecode = 'q' if all(isinstance(w, Integral) for w in weights) else 'd'
+
+        return offsets, targets, array(typecode, weights)
 
-    def dijkstra(self, src: int) -> []:
+
+    def _is_live(self, vertex: int) -> bool:
         """
-        Implements the Dijkstra algorithm to compute the length of the shortest
-        path from a given vertex to all other vertices in the graph. Returns a
-        list with one value per each vertex in the graph. If a certain vertex is
-        not reachable from SRC, the returned value is INFINITY.
+        Returns True if vertex is an index of a vertex in the graph that has
+        not been removed.
         """
-        visited = dict()
+        return 0 <= vertex < self.v_count and vertex not in self._removed
 
-        # Use a priority queue to store neighboring vertices
-        priority_queue = []
-        heapq.heappush(priority_queue, (0, src))
 
-        while len(priority_queue) > 0:
 
-            # Represents distance to the current vertex
-            distance, current = heapq.heappop(priority_queue)
+class LandmarkIndex:
+    """
+    Class to store shortest path lengths between a few landmark vertices and
+    all vertices of a DirectedGraph. By the triangle inequality, these give
+    lower bounds on the distance between any two vertices, which guide A*
+    search in DirectedGraph.landmark_distance().
+    """
+
+    MAGIC = b'ALT1'
+
+    def __init__(self, landmarks, forward, backward, fingerprint):
+        """
+        Store landmark vertex indices, and for each landmark an array of
+        distances from the landmark to every vertex (forward) and from every
+        vertex to the landmark (backward)
+        """
+        self.landmarks = landmarks
+        self.forward = forward
+        self.backward = backward
+        self.fingerprint = fingerprint
 
-            if current not in visited:
-                
-                # Store vertex as the key and its distance as its value in
-                # the hash table
-                visited[current] = distance
+        # Version of the graph the index was built for
+        self.version = None
 
-                # Insert each neighbor and its associated distance as a tuple
-                # into MinHeap/priority queue, where the closest neighbor gets
-                # sorted to the front of the queue
-                for neighbor in range(len(self.adj_matrix[current])):
+    def heuristic(self, dst: int):
+        """
+        Returns a function that takes a vertex and returns a lower bound on
+        its distance to DST.
+        """
+        inf = float('inf')
+        rows = [(f, b, f[dst], b[dst]) for f, b in zip(self.forward, self.backward)]
 
-                    if self.adj_matrix[current][neighbor] != 0:
-                        
-                        # The neighboring vertex's total distance is the sum of
-                        # the current vertex's distance from v0 and the distance
-                        # (weight of the edge) to the neighboring vertex
-                        heapq.heappush(priority_queue, (distance + self.adj_matrix[current][neighbor], neighbor))
+        def bound(v):
+            best = 0
 
-        res = [float('inf')] * len(self.adj_matrix)
+            for f, b, f_dst, b_dst in rows:
 
-        for vertex in visited:
-            res[vertex] = visited[vertex]
+                # d(v, dst) >= d(landmark, dst) - d(landmark, v)
+                if f[v] < inf and f_dst < inf:
+                    best = max(best, f_dst - f[v])
+
+                # d(v, dst) >= d(v, landmark) - d(dst, landmark)
+                if b[v] < inf and b_dst < inf:
+                    best = max(best, b[v] - b_dst)
+
+            return best
+
+        return bound
+
+    def save(self, path) -> None:
+        """
+        Writes the index to a binary file: a magic number, a header with the
+        vertex count, landmark count and graph fingerprint, then the landmark
+        indices and all distance arrays
+        """
+        v_count = len(self.forward[0]) if len(self.forward) > 0 else 0
+
+        with graph_io.replace_file(path) as file:
+            file.write(self.MAGIC)
+            file.write(struct.pack('<qqI', v_count, len(self.landmarks), self.fingerprint))
+            graph_io.write_array(file, array('q', self.landmarks))
+
+            for distances in self.forward + self.backward:
+                graph_io.write_array(file, distances)
+
+    @classmethod
+    def load(cls, path) -> 'LandmarkIndex':
+        """
+        Reads an index written by save()
+        """
+        with open(path, 'rb') as file:
+            if file.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError(f'{path} is not a landmark index file')
+
+            v_count, count, fingerprint = struct.unpack('<qqI', file.read(struct.calcsize('<qqI')))
+            landmarks = graph_io.read_array(file, 'q', count).tolist()
+            distances = [graph_io.read_array(file, 'd', v_count) for _ in range(2 * count)]
+
+        return cls(landmarks, distances[:count], distances[count:], fingerprint)
 
-        return res
+
+class MatrixView(Sequence):
+    """
+    Read-only view of the first size rows and columns of a list of lists
+    adjacency matrix, as returned by DirectedGraph.adj_matrix. Rows are
+    views too, and views compare equal to lists with the same values.
+    """
+
+    def __init__(self, values: list, size: int):
+        self._values = values
+        self._size = size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+
+        if index < 0:
+            index += self._size
+
+        if not 0 <= index < self._size:
+            raise IndexError('matrix index out of range')
+
+        value = self._values[index]
+
+        return MatrixView(value, self._size) if isinstance(value, list) else value
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, (list, MatrixView)) and len(other) == self._size
+                and all(a == b for a, b in zip(self, other)))
+
+    def __repr__(self) -> str:
+        return repr(list(self))
 
 
 
@@ -402,3 +1962,99 @@ if __name__ == '__main__':
     print('\n', g)
     for i in range(5):
         print(f'DIJKSTRA {i} {g.dijkstra(i)}')
+
+
+    print("\nremove_vertex() / compact() example 1")
+    print("------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    g.remove_vertex(1)
+    print(g.get_vertices(), g.get_edges(), sep='\n')
+    print(g.compact())
+    print(g)
+
+
+    print("\nshortest_path() example 1")
+    print("------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    for src, dst in [(0, 2), (2, 0), (4, 1), (1, 1)]:
+        print(f'{src}->{dst} {g.dijkstra(src, dst)[dst]} {g.shortest_path(src, dst)}')
+
+
+    print("\nbidirectional_dijkstra() / astar() / landmark_distance() benchmark")
+    print("-----------------------------------------------------------------------")
+    import random
+    import time
+
+    # Road-like grid graph with edges in both directions, where no edge is
+    # shorter than the grid spacing of 10
+    random.seed(0)
+    side = 60
+    edges = []
+    for x in range(side):
+        for y in range(side):
+            for dx, dy in [(1, 0), (0, 1)]:
+                if x + dx < side and y + dy < side:
+                    u, v = x * side + y, (x + dx) * side + y + dy
+                    weight = random.randint(10, 20)
+                    edges.extend([(u, v, weight), (v, u, weight)])
+    g = DirectedGraph(edges, sparse=True)
+    queries = [(random.randrange(side * side), random.randrange(side * side))
+               for _ in range(20)]
+
+    def manhattan(dst):
+        return lambda v: 10 * (abs(v // side - dst // side) + abs(v % side - dst % side))
+
+    start = time.perf_counter()
+    g.build_landmarks(8)
+    print(f'{"build_landmarks":<24}{time.perf_counter() - start:.3f}s')
+
+    results = []
+    for name, search in [
+            ('dijkstra', lambda src, dst: g.dijkstra(src)[dst]),
+            ('dijkstra with target', lambda src, dst: g.dijkstra(src, dst)[dst]),
+            ('bidirectional_dijkstra', g.bidirectional_dijkstra),
+            ('astar', lambda src, dst: g.astar(src, dst, manhattan(dst))),
+            ('landmark_distance', g.landmark_distance)]:
+        start = time.perf_counter()
+        results.append([search(src, dst) for src, dst in queries])
+        print(f'{name:<24}{time.perf_counter() - start:.3f}s')
+    print('same distances:', all(r == results[0] for r in results))
+
+
+    print("\nmulti_source_bfs() benchmark")
+    print("--------------------------------")
+    random.seed(0)
+    edges = [(random.randrange(300), random.randrange(300), 1) for _ in range(3000)]
+    g = DirectedGraph(edges)
+
+    start = time.perf_counter()
+    loop = [g.bfs(src) for src in range(g.v_count)]
+    print(f'{"bfs loop":<24}{time.perf_counter() - start:.3f}s')
+
+    start = time.perf_counter()
+    hops = g.multi_source_bfs(range(g.v_count))
+    print(f'{"multi_source_bfs":<24}{time.perf_counter() - start:.3f}s')
+    print('same reachable sets:',
+          all(set(path) == {v for v, d in enumerate(h) if d != float('inf')}
+              for path, h in zip(loop, hops)))
+
+
+    print("\nsave() / load() round trip example 1")
+    print("--------------------------------------")
+    import tempfile
+
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'graph.bin')
+        DirectedGraph(edges).save(path)
+
+        # Save a graph mapped from the file back over the same file
+        g = DirectedGraph.load(path)
+        g.add_edge(0, 2, 4)
+        g.save(path)
+        print(g.get_edges() == DirectedGraph.load(path).get_edges())
@@ -0,0 +1,319 @@
+from array import array
+
+import graph_kernels
+
+
+class FrozenGraph:
+    """
+    Class to implement an immutable snapshot of a DirectedGraph or an
+    UndirectedGraph, as made by their freeze() methods
+    - edges stored as read-only CSR arrays over vertex indices
+    - undirected snapshots number vertices in alphabetical order of their
+      names and store every edge in both directions
+    - no method changes the snapshot and traversals keep their state in
+      local variables, so any number of threads can read it without locks
+    - snapshots are hashable, and equal if they hold the same graph
+    """
+
+    __slots__ = ('directed', 'v_count', 'version', '_names', '_index', '_removed',
+                 '_offsets', '_targets', '_weights', '_cyclic', '_order',
+                 '_component_count', '_key', '_hash')
+
+    def __init__(self, offsets, targets, weights=None, names=None, removed=(),
+                 cyclic=False, order=(), component_count=None, version=0):
+        """
+        Copy CSR offsets and targets arrays, and for directed snapshots the
+        weights array, into read-only storage. Names is the sequence of
+        vertex names of an undirected snapshot by index. The cycle flag,
+        topological order and component count are answers precomputed by the
+        graph the snapshot is made from, at the given version
+        """
+        offsets, targets = _read_only(offsets), _read_only(targets)
+        weights = None if weights is None else _read_only(weights)
+        names = None if names is None else tuple(names)
+        removed = frozenset(removed)
+
+        values = {
+            'directed': names is None,
+            'v_count': len(offsets) - 1,
+            'version': version,
+            '_names': names,
+            '_index': None if names is None else {v: i for i, v in enumerate(names)},
+            '_removed': removed,
+            '_offsets': offsets,
+            '_targets': targets,
+            '_weights': weights,
+            '_cyclic': cyclic,
+            '_order': tuple(order),
+            '_component_count': component_count,
+
+            # Compared and hashed as a whole; the bytes objects behind the
+            # views hold the array contents
+            '_key': (names, removed, offsets.obj, targets.obj,
+                     None if weights is None else weights.obj),
+        }
+        values['_hash'] = hash(values['_key'])
+
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('FrozenGraph is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('FrozenGraph is immutable')
+
+    def __eq__(self, other):
+        return isinstance(other, FrozenGraph) and self._key == other._key
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        """
+        Rebuild from CSR arrays when pickled, e.g. to send the snapshot to
+        another interpreter
+        """
+        weights = None if self._weights is None else _to_array(self._weights)
+
+        return (FrozenGraph, (_to_array(self._offsets), _to_array(self._targets), weights,
+                              self._names, self._removed, self._cyclic, self._order,
+                              self._component_count, self.version))
+
+    # ------------------------------------------------------------------ #
+
+    def _position(self, v) -> int:
+        """
+        Return index of vertex v, or -1 if v is not in the snapshot
+        """
+        if self._index is not None:
+            return self._index.get(v, -1)
+
+        if isinstance(v, int) and 0 <= v < self.v_count and v not in self._removed:
+            return v
+
+        return -1
+
+
+    def _name(self, i: int):
+        """
+        Return vertex at index i as the graph it was made from refers to it
+        """
+        return i if self._names is None else self._names[i]
+
+
+    def get_vertices(self) -> []:
+        """
+        Return list of vertices in the snapshot, in ascending order of index
+        """
+        if self._names is not None:
+            return list(self._names)
+
+        return [v for v in range(self.v_count) if v not in self._removed]
+
+
+    def get_edges(self) -> []:
+        """
+        Return list of edges in the snapshot
+        """
+        return list(self.iter_edges())
+
+
+    def iter_edges(self):
+        """
+        Generator. Yield (src, dst, weight) tuples for the edges of a directed
+        snapshot, or a (u, v) tuple for each edge of an undirected snapshot
+        """
+        offsets, targets = self._offsets, self._targets
+
+        for u in range(self.v_count):
+            for pos in range(offsets[u], offsets[u + 1]):
+                v = targets[pos]
+
+                if self.directed:
+                    yield u, v, self._weights[pos]
+
+                # Undirected edges are stored in both directions
+                elif u < v:
+                    yield self._names[u], self._names[v]
+
+
+    def neighbors(self, v) -> []:
+        """
+        Return list of vertices one edge away from v, in ascending order of
+        index, or an empty list if v is not in the snapshot
+        """
+        i = self._position(v)
+
+        if i == -1:
+            return []
+
+        return [self._name(j) for j in self._targets[self._offsets[i]:self._offsets[i + 1]]]
+
+
+    def is_valid_path(self, path: []) -> bool:
+        """
+        Return True if every vertex of path is in the snapshot and every
+        vertex is connected to the next one by an edge. Empty paths are valid
+        """
+        positions = [self._position(v) for v in path]
+
+        if -1 in positions:
+            return False
+
+        for i, j in zip(positions, positions[1:]):
+            if j not in self._targets[self._offsets[i]:self._offsets[i + 1]]:
+                return False
+
+        return True
+
+
+    def dfs(self, v_start, v_end=None) -> []:
+        """
+        Return list of vertices visited during DFS search, picking vertices
+        in ascending order of index
+        """
+        return list(self.iter_dfs(v_start, v_end))
+
+
+    def iter_dfs(self, v_start, v_end=None):
+        """
+        Generator version of dfs. Yield vertices in the order they are
+        visited
+        """
+        start, end = self._position(v_start), self._position(v_end)
+
+        if start == -1:
+            return
+
+        offsets, targets = self._offsets, self._targets
+        visited = bytearray(self.v_count)
+        visited[start] = 1
+        yield v_start
+
+        if start == end:
+            return
+
+        # For each vertex on the current path, the position of its next edge
+        # and the end of its edges
+        stack = [offsets[start]]
+        ends = [offsets[start + 1]]
+
+        while len(stack) > 0:
+
+            pos = stack[-1]
+
+            if pos == ends[-1]:
+                stack.pop()
+                ends.pop()
+                continue
+
+            stack[-1] = pos + 1
+            neighbor = targets[pos]
+
+            if not visited[neighbor]:
+                visited[neighbor] = 1
+                yield self._name(neighbor)
+
+                if neighbor == end:
+                    return
+
+                stack.append(offsets[neighbor])
+                ends.append(offsets[neighbor + 1])
+
+
+    def bfs(self, v_start, v_end=None) -> []:
+        """
+        Return list of vertices visited during BFS search, picking vertices
+        in ascending order of index
+        """
+        return list(self.iter_bfs(v_start, v_end))
+
+
+    def iter_bfs(self, v_start, v_end=None):
+        """
+        Generator version of bfs. Yield vertices in the order they are
+        visited
+        """
+        start, end = self._position(v_start), self._position(v_end)
+
+        if start == -1:
+            return
+
+        offsets, targets = self._offsets, self._targets
+        visited = bytearray(self.v_count)
+        visited[start] = 1
+
+        # Vertices are marked when enqueued, so each one is enqueued once
+        queue = [start]
+        head = 0
+
+        while head < len(queue):
+
+            current = queue[head]
+            head += 1
+            yield self._name(current)
+
+            if current == end:
+                return
+
+            for pos in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[pos]
+
+                if not visited[neighbor]:
+                    visited[neighbor] = 1
+                    queue.append(neighbor)
+
+
+    def dijkstra(self, src: int) -> []:
+        """
+        Return list with the length of the shortest path from src to every
+        vertex of a directed snapshot, with INFINITY for unreachable vertices
+        """
+        if not self.directed:
+            raise TypeError('undirected snapshots have no edge weights')
+
+        if self._position(src) == -1:
+            return [float('inf')] * self.v_count
+
+        return graph_kernels.dijkstra(self._offsets, self._targets, self._weights, src)
+
+
+    def has_cycle(self) -> bool:
+        """
+        Return True if the snapshot contains a cycle, False otherwise
+        """
+        return self._cyclic
+
+
+    def topological_order(self) -> []:
+        """
+        Return list of all vertices of a directed snapshot in which every
+        edge leads from an earlier vertex to a later one, or an empty list if
+        the snapshot has a cycle
+        """
+        return list(self._order)
+
+
+    def count_connected_components(self):
+        """
+        Return number of connected components of an undirected snapshot
+        """
+        return self._component_count
+
+
+def _read_only(values) -> memoryview:
+    """
+    Return a read-only memoryview over a copy of an array, or of a buffer
+    of array values
+    """
+    values = memoryview(values)
+
+    return memoryview(values.tobytes()).cast(values.format)
+
+
+def _to_array(values) -> array:
+    """
+    Return a copy of a memoryview made by _read_only() as an array
+    """
+    return array(values.format, values.obj)
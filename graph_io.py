@@ -0,0 +1,337 @@
+import csv
+import mmap
+import os
+import sys
+from array import array
+from contextlib import contextmanager
+from itertools import islice
+from numbers import Real
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def read_rows(source, delimiter=None):
+    """
+    Return an iterable over the rows of an edge list. Source may be an
+    iterable of rows, a NumPy array, the path of a CSV/TSV file, or a file
+    opened in text mode, which is read line by line. For files, the
+    delimiter defaults to a tab for .tsv files and a comma otherwise, and
+    blank lines and lines starting with '#' are skipped.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return _read_file(source, delimiter)
+
+    if hasattr(source, 'read'):
+        return _read_lines(source, delimiter)
+
+    if np is not None and isinstance(source, np.ndarray):
+        return source.tolist()
+
+    return source
+
+
+def _read_file(path, delimiter):
+    """
+    Generator helper for read_rows
+    """
+    with open(path, newline='') as file:
+        yield from _read_lines(file, delimiter)
+
+
+def _read_lines(file, delimiter):
+    """
+    Generator helper for read_rows
+    """
+    if delimiter is None:
+        delimiter = _default_delimiter(file)
+
+    for row in csv.reader(file, delimiter=delimiter):
+        if len(row) > 0 and not row[0].startswith('#'):
+            yield [field.strip() for field in row]
+
+
+def _default_delimiter(file) -> str:
+    """
+    Return a tab for files named *.tsv and a comma otherwise
+    """
+    name = getattr(file, 'name', '')
+
+    return '\t' if isinstance(name, str) and name.endswith('.tsv') else ','
+
+
+def chunks(rows, size):
+    """
+    Generator. Yield lists of up to size consecutive items of an iterable,
+    holding only one list in memory at a time
+    """
+    rows = iter(rows)
+
+    while True:
+        chunk = list(islice(rows, size))
+
+        if len(chunk) == 0:
+            return
+
+        yield chunk
+
+
+def read_weighted_edges(source, rejected=None, weight=int, integral=False):
+    """
+    Read (src, dst[, weight]) rows with integer vertex indices, as accepted by
+    DirectedGraph. Weights are converted with the weight function as in
+    iter_weighted_rows(), and missing weights default to 1. Rows that cannot
+    be parsed, or that have a negative index, a loop, or a weight below 1 are
+    dropped, as are rows with a fractional weight if integral is True; if
+    rejected is a list, a (row number, row) tuple is appended to it for each
+    of them.
+
+    Returns a tuple (v_count, src, dst, weight) where v_count is one more than
+    the largest index used by a valid edge and src, dst and weight are lists
+    sorted by (src, dst). For duplicate edges the last weight wins.
+    """
+    if np is not None and _is_int_matrix(source):
+        numbers = np.arange(len(source))
+        weights = source[:, 2] if source.shape[1] == 3 else np.ones(len(source), np.int64)
+        return _validate_numpy(numbers, source[:, 0], source[:, 1], weights, rejected, integral)
+
+    numbers, src, dst, weights = [], [], [], []
+
+    for i, u, v, w in iter_weighted_rows(source, rejected, weight):
+        numbers.append(i)
+        src.append(u)
+        dst.append(v)
+        weights.append(w)
+
+    if np is not None:
+        return _validate_numpy(numbers, src, dst, weights, rejected, integral)
+
+    edges = dict()
+    v_count = 0
+
+    for i, u, v, w in zip(numbers, src, dst, weights):
+        if u < 0 or v < 0 or u == v or w < 1 or (integral and not float(w).is_integer()):
+            if rejected is not None:
+                rejected.append((i, (u, v, w)))
+            continue
+
+        edges[(u, v)] = w
+        v_count = max(v_count, u + 1, v + 1)
+
+    keys = sorted(edges)
+
+    return (v_count, [u for u, _ in keys], [v for _, v in keys],
+            [edges[key] for key in keys])
+
+
+def iter_weighted_rows(source, rejected=None, weight=int):
+    """
+    Generator. Parse the (src, dst[, weight]) rows of source, as accepted by
+    read_rows(), one at a time, and yield (row number, src, dst, weight)
+    tuples. Indices are converted with int(). Weights read as text are
+    converted with the weight function, numeric weights are kept as they are
+    and missing weights default to 1. Rows that cannot be parsed, or whose
+    weight is not a number, are dropped, and appended to rejected as for
+    read_weighted_edges(). Indices and weights are not otherwise checked
+    """
+    for i, row in enumerate(read_rows(source)):
+        try:
+            if len(row) == 2:
+                u, v, w = int(row[0]), int(row[1]), 1
+            else:
+                u, v, w = row
+                u, v = int(u), int(v)
+
+                if isinstance(w, str):
+                    w = weight(w)
+                elif not isinstance(w, Real):
+                    raise TypeError(f'weight {w!r} is not a number')
+        except (TypeError, ValueError):
+            if rejected is not None:
+                rejected.append((i, row))
+            continue
+
+        yield i, u, v, w
+
+
+def _is_int_matrix(source):
+    """
+    Return True if source is a NumPy integer array with two or three columns
+    """
+    return (isinstance(source, np.ndarray) and source.ndim == 2
+            and source.shape[1] in (2, 3) and source.dtype.kind in 'iu')
+
+
+def _validate_numpy(numbers, src, dst, weight, rejected, integral):
+    """
+    Vectorized validation and deduplication for read_weighted_edges
+    """
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+
+    # Integer weights stay integers and fractional weights stay fractional
+    weight = np.asarray(weight)
+
+    valid = (src >= 0) & (dst >= 0) & (src != dst) & (weight >= 1)
+
+    if integral:
+        valid &= np.mod(weight, 1) == 0
+
+    if rejected is not None:
+        for i in np.flatnonzero(~valid).tolist():
+            rejected.append((int(numbers[i]), (int(src[i]), int(dst[i]), weight[i].item())))
+
+    src, dst, weight = src[valid], dst[valid], weight[valid]
+
+    if len(src) == 0:
+        return 0, [], [], []
+
+    v_count = int(max(src.max(), dst.max())) + 1
+
+    # Unique keys of the reversed edge list keep the last weight of each
+    # duplicate and come out sorted by (src, dst)
+    keys, first = np.unique((src * v_count + dst)[::-1], return_index=True)
+    weight = weight[::-1][first]
+
+    return (v_count, (keys // v_count).tolist(), (keys % v_count).tolist(),
+            weight.tolist())
+
+
+def read_named_edges(source, rejected=None):
+    """
+    Read (u, v) rows with string vertex names, as accepted by UndirectedGraph.
+    Rows that do not have exactly two fields, or that form a loop, are
+    dropped; if rejected is a list, a (row number, row) tuple is appended to
+    it for each of them.
+
+    Returns a list of (u, v) tuples in input order.
+    """
+    return list(iter_named_edges(source, rejected))
+
+
+def iter_named_edges(source, rejected=None):
+    """
+    Generator version of read_named_edges. Yield (u, v) tuples one at a time
+    """
+    for i, row in enumerate(read_rows(source)):
+        try:
+            u, v = row
+        except (TypeError, ValueError):
+            u = v = None
+
+        if u is None or u == v:
+            if rejected is not None:
+                rejected.append((i, row))
+            continue
+
+        yield u, v
+
+
+def write_edges(target, edges, delimiter=None) -> int:
+    """
+    Write edge tuples from an iterable to target, a path or a file opened in
+    text mode, one CSV/TSV row at a time, so the edges never have to be in
+    memory at once. The delimiter defaults as for read_rows(). Return the
+    number of rows written
+    """
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, 'w', newline='') as file:
+            return write_edges(file, edges, delimiter)
+
+    if delimiter is None:
+        delimiter = _default_delimiter(target)
+
+    writer = csv.writer(target, delimiter=delimiter, lineterminator='\n')
+    count = 0
+
+    for edge in edges:
+        writer.writerow(edge)
+        count += 1
+
+    return count
+
+
+def write_array(file, values) -> None:
+    """
+    Write an array, or a memoryview of array values, to a binary file in
+    little-endian byte order
+    """
+    if sys.byteorder == 'big':
+        values = array(memoryview(values).format, values)
+        values.byteswap()
+
+    file.write(memoryview(values).cast('B'))
+
+
+@contextmanager
+def replace_file(path):
+    """
+    Context manager. Open a temporary file in the directory of path for
+    writing in binary mode and move it over path once the block completes,
+    so readers never see a partly written file and buffers that
+    open_buffer() mapped from the old file stay valid. The temporary file is
+    deleted if the block raises
+    """
+    # open() applies the umask as for any other file, unlike mkstemp()
+    temp = f'{os.fspath(path)}.{os.urandom(4).hex()}.tmp'
+    file = open(temp, 'xb')
+
+    try:
+        with file:
+            yield file
+
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def read_array(file, typecode, count) -> array:
+    """
+    Read count little-endian values of the given array typecode from a
+    binary file
+    """
+    values = array(typecode)
+    values.fromfile(file, count)
+
+    if sys.byteorder == 'big':
+        values.byteswap()
+
+    return values
+
+
+def open_buffer(path, mapped=True) -> memoryview:
+    """
+    Return the contents of a binary file as a read-only buffer. If mapped is
+    True, the file is memory-mapped instead of read, so pages are only read
+    from disk when accessed and are shared by all processes mapping the file
+    """
+    with open(path, 'rb') as file:
+        if mapped:
+            return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+        return memoryview(file.read())
+
+
+def buffer_array(buffer, offset, typecode, count, copy=False) -> tuple:
+    """
+    Return a tuple of the count little-endian values of the given array
+    typecode stored in a buffer from open_buffer() at a byte offset, and the
+    offset following them. The values are a memoryview into the buffer, or
+    an array holding a copy if copy is True or the machine is big-endian
+    """
+    end = offset + count * array(typecode).itemsize
+    data = buffer[offset:end]
+
+    if not copy and sys.byteorder == 'little':
+        return data.cast(typecode), end
+
+    values = array(typecode)
+    values.frombytes(data)
+
+    if sys.byteorder == 'big':
+        values.byteswap()
+
+    return values, end
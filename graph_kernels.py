@@ -0,0 +1,241 @@
+import heapq
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+
+def dijkstra(offsets, targets, weights, src) -> []:
+    """
+    Return list of shortest path lengths from src to every vertex of a graph
+    stored as CSR arrays, with INFINITY for unreachable vertices
+    """
+    distances = [float('inf')] * (len(offsets) - 1)
+    settled = bytearray(len(offsets) - 1)
+    distances[src] = 0
+
+    priority_queue = [(0, src)]
+
+    while len(priority_queue) > 0:
+
+        distance, current = heapq.heappop(priority_queue)
+
+        # Skip entries made obsolete by a shorter path found later
+        if settled[current]:
+            continue
+
+        settled[current] = 1
+
+        for pos in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[pos]
+
+            if distance + weights[pos] < distances[neighbor]:
+                distances[neighbor] = distance + weights[pos]
+                heapq.heappush(priority_queue, (distance + weights[pos], neighbor))
+
+    return distances
+
+
+def dfs(offsets, targets, src, visited=None) -> []:
+    """
+    Return list of vertices visited during DFS search from src, picking
+    neighbors in ascending order. A zeroed bytearray with one entry per
+    vertex may be passed as visited; it is zeroed again before returning,
+    so it can be reused for the next search
+    """
+    if visited is None:
+        visited = bytearray(len(offsets) - 1)
+
+    path = [src]
+    visited[src] = 1
+
+    # For each vertex on the current path, the position of its next edge
+    # and the end of its edges. Each vertex enters the stack only once
+    stack = [offsets[src]]
+    ends = [offsets[src + 1]]
+
+    while len(stack) > 0:
+
+        pos = stack[-1]
+
+        if pos == ends[-1]:
+            stack.pop()
+            ends.pop()
+            continue
+
+        stack[-1] = pos + 1
+        neighbor = targets[pos]
+
+        if not visited[neighbor]:
+            visited[neighbor] = 1
+            path.append(neighbor)
+            stack.append(offsets[neighbor])
+            ends.append(offsets[neighbor + 1])
+
+    for vertex in path:
+        visited[vertex] = 0
+
+    return path
+
+
+def bfs(offsets, targets, src, visited=None) -> []:
+    """
+    Return list of vertices visited during BFS search from src, picking
+    neighbors in ascending order. Visited is handled as for dfs()
+    """
+    if visited is None:
+        visited = bytearray(len(offsets) - 1)
+
+    # Vertices are marked when enqueued, so each one is enqueued only once,
+    # and the path doubles as the queue
+    path = [src]
+    visited[src] = 1
+    head = 0
+
+    while head < len(path):
+
+        current = path[head]
+        head += 1
+
+        for pos in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[pos]
+
+            if not visited[neighbor]:
+                visited[neighbor] = 1
+                path.append(neighbor)
+
+    for vertex in path:
+        visited[vertex] = 0
+
+    return path
+
+
+def run(arrays, kind, sources) -> []:
+    """
+    Return list of (source, result) tuples from running the 'bfs', 'dfs' or
+    'dijkstra' kernel from every source over a dict of CSR arrays
+    """
+    offsets, targets = arrays['offsets'], arrays['targets']
+
+    if kind == 'dijkstra':
+        weights = arrays['weights']
+        return [(src, dijkstra(offsets, targets, weights, src)) for src in sources]
+
+    kernel = bfs if kind == 'bfs' else dfs
+
+    # One visited buffer serves every search
+    visited = bytearray(len(offsets) - 1)
+
+    return [(src, kernel(offsets, targets, src, visited)) for src in sources]
+
+
+def batch(arrays, kind, sources, workers):
+    """
+    Generator. Run a kernel from every source, splitting the sources over a
+    pool of workers that share the CSR arrays, and yield (source, result)
+    tuples as soon as each worker finishes a chunk of sources
+    """
+    sources = list(sources)
+
+    if workers == 1 or len(sources) < 2:
+        for src in sources:
+            yield from run(arrays, kind, [src])
+        return
+
+    # Several chunks per worker let results stream back early and keep the
+    # pool busy when some sources take longer than others
+    size = max(1, len(sources) // (4 * workers))
+    chunks = [sources[i:i + size] for i in range(0, len(sources), size)]
+
+    with SharedArrays(**arrays) as shared:
+        with ProcessPoolExecutor(workers, initializer=attach, initargs=(shared.spec,)) as pool:
+            futures = [pool.submit(run_attached, kind, chunk) for chunk in chunks]
+
+            for future in as_completed(futures):
+                yield from future.result()
+
+
+class SharedArrays:
+    """
+    Context manager that copies arrays into shared memory blocks, so worker
+    processes can attach to them by name instead of receiving copies
+    """
+
+    def __init__(self, **arrays):
+        """
+        Copy each keyword argument array, or memoryview of array values,
+        into its own shared memory block
+        """
+        self.blocks = dict()
+
+        # Maps each array name to (block name, typecode, length), which is
+        # all a worker needs to attach to it
+        self.spec = dict()
+
+        for name, values in arrays.items():
+            values = memoryview(values)
+            data = values.cast('B')
+            block = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+            block.buf[:len(data)] = data
+
+            self.blocks[name] = block
+            self.spec[name] = (block.name, values.format, len(values))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+
+    def view(self, name) -> memoryview:
+        """
+        Return a memoryview of a shared array in this process. The view must
+        be released before the context exits
+        """
+        _, typecode, length = self.spec[name]
+        return _view(self.blocks[name], typecode, length)
+
+
+def _view(block, typecode, length) -> memoryview:
+    """
+    Return a memoryview of the first length items of a shared memory block
+    """
+    return block.buf[:length * array(typecode).itemsize].cast(typecode)
+
+
+# Shared arrays attached in a worker process, by name
+_attached = dict()
+_blocks = []
+
+
+def attach(spec) -> None:
+    """
+    Worker process initializer. Attach to the shared arrays described by
+    the spec of a SharedArrays instance
+    """
+    for name, (block_name, typecode, length) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        _attached[name] = _view(block, typecode, length)
+
+
+def dijkstra_rows(sources) -> None:
+    """
+    Worker task. Write shortest path lengths from each source into its row
+    of the shared result matrix
+    """
+    offsets, targets, weights = _attached['offsets'], _attached['targets'], _attached['weights']
+    result = _attached['result']
+    v_count = len(offsets) - 1
+
+    for src in sources:
+        row = array('d', dijkstra(offsets, targets, weights, src))
+        result[src * v_count:(src + 1) * v_count] = row
+
+
+def run_attached(kind, sources) -> []:
+    """
+    Worker task. Run a kernel from every source over the attached arrays
+    """
+    return run(_attached, kind, sources)
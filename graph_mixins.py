@@ -0,0 +1,195 @@
+from array import array
+from contextlib import contextmanager
+
+from query_cache import QueryCache
+
+
+class VisitMarks:
+    """
+    Mixin class to hand out reusable visited marks to traversals
+    - classes using it set self._marks to an empty list in __init__ and
+      define _id_count()
+    """
+
+    def _take_marks(self) -> tuple:
+        """
+        Return a (marks, stamp) pair for a traversal. Marks is an array with
+        at least one entry per vertex index that is reused across calls, and
+        a vertex counts as visited once its entry equals stamp. Every use gets
+        a new stamp, so the array never has to be cleared. Traversals that are
+        still running hold their own pair, so they do not interfere
+        """
+        marks, stamp = self._marks.pop() if len(self._marks) > 0 else (array('L'), 0)
+        count = self._id_count()
+
+        if len(marks) < count:
+            marks.frombytes(bytes(marks.itemsize * (count - len(marks))))
+
+        # Start over with a cleared array when stamps run out
+        stamp += 1
+        if stamp > 0xFFFFFFFF:
+            marks = array('L', bytes(marks.itemsize * len(marks)))
+            stamp = 1
+
+        return marks, stamp
+
+
+    def _give_marks(self, marks, stamp) -> None:
+        """
+        Hand back a pair obtained from _take_marks() for reuse
+        """
+        self._marks.append((marks, stamp))
+
+
+class CachedQueries:
+    """
+    Mixin class to cache query results of a graph until it changes
+    - classes using it set self._cache to None in __init__, keep a version
+      counter in self._version, and route queries through _cached()
+    """
+
+    def enable_cache(self, maxsize=128) -> None:
+        """
+        Turn on caching of dfs and bfs results, and of dijkstra and
+        shortest_paths results on directed graphs. Up to maxsize results are
+        kept, least recently used first out, and any change to the graph
+        drops them all. Callers get copies of cached results. Calling again
+        replaces the cache and resets its statistics
+        """
+        self._cache = QueryCache(maxsize)
+
+
+    def disable_cache(self) -> None:
+        """
+        Turn off caching of query results and drop the cached results
+        """
+        self._cache = None
+
+
+    def cache_info(self):
+        """
+        Return dict with the number of cache hits and misses and the current
+        and maximum number of cached results, or None if caching is off
+        """
+        return None if self._cache is None else self._cache.info()
+
+
+    def _cached(self, key, compute):
+        """
+        Return compute(), or its cached result for key if caching is on
+        """
+        if self._cache is None:
+            return compute()
+
+        return self._cache.lookup(key, self._version, compute)
+
+
+class ChangeLog:
+    """
+    Mixin class to report edge changes to subscribers, and to net the
+    changes made in a batch() block into one change log
+    - classes using it set self._subscribers to an empty list, self._log to
+      None and self._depth to 0 in __init__, and pass every change to
+      _record() as lists of added and removed edge tuples
+    - classes using it define _current_edge(key), which returns the edge
+      tuple with the given key as it is in the graph now, or None if the
+      graph has no such edge
+    - the first two items of an edge tuple identify the edge, unless the
+      class overrides _edge_key()
+    """
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager. Gather the edge changes made in the with block, so
+        subscribers receive a single call when the outermost block exits,
+        even if it raises an exception. The log is net: an edge that changed
+        appears once, with its state before the block in removed and its
+        state after the block in added, and edges that ended up as they were
+        are left out. Changes are applied to the graph as they are made, so
+        queries, save() and freeze() inside the block see them
+        """
+        outer = self._depth == 0
+
+        # Changes are only logged if someone is listening
+        if outer and len(self._subscribers) > 0:
+            self._log = dict()
+
+        self._depth += 1
+
+        try:
+            yield self
+
+        finally:
+            self._depth -= 1
+
+            if outer and self._log is not None:
+                log, self._log = self._log, None
+                self._record(*self._net(log))
+
+
+    def subscribe(self, callback) -> None:
+        """
+        Register a function to be called as callback(added, removed) after
+        edges change, with lists of the edges added to and removed from the
+        graph. Directed graphs report (src, dst, weight) edges, and an edge
+        whose weight changed is in both lists; undirected graphs report
+        (u, v) edges. Changes made in a batch() block are reported in one call
+        """
+        self._subscribers.append(callback)
+
+
+    def unsubscribe(self, callback) -> None:
+        """
+        Remove a function registered with subscribe(), if it is registered
+        """
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+
+    def _record(self, added, removed) -> None:
+        """
+        Pass edge changes to the subscribers. During a batch, keep the state
+        of each changed edge before its first change instead: the removed
+        edge, or None for an added edge
+        """
+        log = self._log
+
+        if log is not None:
+            for edge in removed:
+                log.setdefault(self._edge_key(edge), edge)
+            for edge in added:
+                log.setdefault(self._edge_key(edge), None)
+
+        elif self._depth == 0 and (len(added) > 0 or len(removed) > 0):
+            for callback in list(self._subscribers):
+                callback(added, removed)
+
+
+    def _net(self, log) -> tuple:
+        """
+        Return lists of the added and removed edges of a batch, comparing
+        the state of each changed edge before the batch with its state now
+        """
+        added, removed = [], []
+
+        for key, before in log.items():
+            after = self._current_edge(key)
+
+            # Edges with the same key only differ in their weight
+            if before is not None and after is not None and before[2:] == after[2:]:
+                continue
+
+            if before is not None:
+                removed.append(before)
+            if after is not None:
+                added.append(after)
+
+        return added, removed
+
+
+    def _edge_key(self, edge) -> tuple:
+        """
+        Return the key that identifies an edge tuple in the change log
+        """
+        return edge[:2]
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    Class to implement a least-recently-used cache of query results for one
+    graph
+    - holds at most maxsize results
+    - results belong to one version of the graph and are all dropped once
+      the graph reports a different version
+    - counts hits and misses
+    """
+
+    def __init__(self, maxsize=128):
+        """
+        Store cached results by query key, least recently used first
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._version = None
+        self._results = OrderedDict()
+
+    def lookup(self, key, version, compute):
+        """
+        Return result of the query identified by key on the given version of
+        the graph. On a miss, call compute() to produce the result and store
+        it, evicting the least recently used result if the cache is full
+        """
+        if version != self._version:
+            self._results.clear()
+            self._version = version
+
+        if key in self._results:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return self._results[key]
+
+        self.misses += 1
+        result = compute()
+        self._results[key] = result
+
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+        return result
+
+    def info(self) -> dict:
+        """
+        Return dict with the number of hits and misses, and the current and
+        maximum number of stored results
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._results), 'maxsize': self.maxsize}
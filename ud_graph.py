@@ -1,19 +1,68 @@
+import os
+import struct
+from array import array
 from collections import deque
+from collections.abc import Mapping
 
-class UndirectedGraph:
+import graph_io
+import graph_kernels
+from graph_mixins import CachedQueries, ChangeLog, VisitMarks
+from frozen_graph import FrozenGraph
+
+class UndirectedGraph(VisitMarks, CachedQueries, ChangeLog):
     """
     Class to implement undirected graph
     - duplicate edges not allowed
     - loops not allowed
     - no edge weights
-    - vertex names are strings
+    - vertex names are strings, interned to integer ids
+    - neighbors stored as insertion-ordered dicts of ids for O(1) membership
+      tests and removal
     """
 
+    # Magic number of files written by save()
+    MAGIC = b'UGR1'
+
     def __init__(self, start_edges=None):
         """
-        Store graph info as adjacency list
+        Store graph info as adjacency list over interned vertex ids
         """
-        self.adj_list = dict()
+        # Maps each vertex name to its id, in the order vertices were added
+        self._ids = dict()
+
+        # Name and neighbor ids of each vertex id. Slots of removed vertices
+        # hold None and their ids are kept in _free for reuse
+        self._names = []
+        self._adj = []
+        self._free = []
+
+        # Cache of neighbor ids sorted by vertex name, used by traversals.
+        # Entries are dropped whenever a vertex's adjacency changes
+        self._sorted = dict()
+
+        # Visited marks handed out to traversals, see _take_marks()
+        self._marks = []
+
+        # Incremented on every change to vertices or edges, and the latest
+        # snapshot published by freeze()
+        self._version = 0
+        self.snapshot = None
+
+        # Query results of the current version, see enable_cache()
+        self._cache = None
+
+        # Functions called with lists of added and removed edges, and the
+        # change log and nesting depth of running batch() blocks
+        self._subscribers = []
+        self._log = None
+        self._depth = 0
+
+        # Cycle flag, union-find parent ids and number of connected
+        # components maintained across edge insertions. The flag and the
+        # parents are None when they have to be recomputed
+        self._cyclic = None
+        self._parent = None
+        self._component_count = 0
 
         # populate graph with initial vertices and edges (if provided)
         # before using, implement add_vertex() and add_edge() methods
@@ -25,7 +74,8 @@ class UndirectedGraph:
         """
         Return content of the graph in human-readable form
         """
-        out = [f'{v}: {self.adj_list[v]}' for v in self.adj_list]
+        names = self._names
+        out = [f'{v}: {[names[j] for j in self._adj[i]]}' for v, i in self._ids.items()]
         out = '\n  '.join(out)
         if len(out) < 70:
             out = out.replace('\n  ', ', ')
@@ -34,14 +84,251 @@ class UndirectedGraph:
 
     # ------------------------------------------------------------------ #
 
+    @classmethod
+    def from_edges(cls, edges, rejected=None):
+        """
+        Build graph from an iterable of (u, v) rows, a NumPy array with two
+        columns, or the path of a CSV/TSV file, in a single pass. Loops are
+        skipped, as are rows that do not have exactly two fields; if rejected
+        is a list, a (row number, row) tuple is appended to it for each of
+        them. Duplicate edges are ignored.
+        """
+        graph = cls()
+
+        for u, v in graph_io.read_named_edges(edges, rejected):
+            i, j = graph._intern(u), graph._intern(v)
+            graph._adj[i][j] = None
+            graph._adj[j][i] = None
+
+        return graph
+
+
+    def ingest(self, source, rejected=None) -> None:
+        """
+        Add the edges of a stream of (u, v) rows to the graph, one row at a
+        time, so memory use does not grow with the length of the stream.
+        Source may be any iterable of rows, a NumPy array, the path of a
+        CSV/TSV file or a file opened in text mode. Loops and rows that do
+        not have exactly two fields are skipped, and appended to rejected as
+        for from_edges()
+        """
+        for u, v in graph_io.iter_named_edges(source, rejected):
+            self.add_edge(u, v)
+
+
+    def export(self, target, delimiter=None) -> int:
+        """
+        Write the edges of the graph to target, a path or a file opened in
+        text mode, as (u, v) CSV/TSV rows that ingest() and from_edges() can
+        read back. Edges are generated and written one at a time. Return the
+        number of edges written
+        """
+        return graph_io.write_edges(target, self.iter_edges(), delimiter)
+
+
+    def save(self, path) -> None:
+        """
+        Write graph to a binary file: a magic number, a header with the
+        vertex count, adjacency length and name table length, then CSR
+        offsets and targets over vertex positions, the offsets of each name
+        in the name table, and the UTF-8 name table. Vertices and neighbors
+        keep their order. The file is replaced in one step, so a graph mapped
+        from path can be saved back to it
+        """
+        if not all(isinstance(v, str) for v in self._ids):
+            raise ValueError('only graphs with string vertex names can be saved')
+
+        # Number vertices by position, skipping ids of removed vertices
+        position = array('q', [0]) * len(self._names)
+        for k, i in enumerate(self._ids.values()):
+            position[i] = k
+
+        offsets, targets = array('q', [0]), array('q')
+        for i in self._ids.values():
+            targets.extend(position[j] for j in self._adj[i])
+            offsets.append(len(targets))
+
+        names = [v.encode() for v in self._ids]
+        name_offsets = array('q', [0])
+        for name in names:
+            name_offsets.append(name_offsets[-1] + len(name))
+
+        with graph_io.replace_file(path) as file:
+            file.write(self.MAGIC)
+            file.write(struct.pack('<4xqqq', len(names), len(targets), name_offsets[-1]))
+
+            for values in (offsets, targets, name_offsets):
+                graph_io.write_array(file, values)
+
+            file.write(b''.join(names))
+
+
+    @classmethod
+    def load(cls, path, mmap=True) -> 'UndirectedGraph':
+        """
+        Read a graph written by save(). If mmap is True, the file is
+        memory-mapped instead of read, so no copy of its arrays is made and
+        processes loading the same file share its pages. Adjacency dicts are
+        built straight from slices of the mapped arrays
+        """
+        buffer = graph_io.open_buffer(path, mmap)
+        header = struct.Struct('<4xqqq')
+
+        if bytes(buffer[:len(cls.MAGIC)]) != cls.MAGIC:
+            raise ValueError(f'{path} is not a graph file')
+
+        v_count, a_count, n_count = header.unpack_from(buffer, len(cls.MAGIC))
+        pos = len(cls.MAGIC) + header.size
+
+        offsets, pos = graph_io.buffer_array(buffer, pos, 'q', v_count + 1)
+        targets, pos = graph_io.buffer_array(buffer, pos, 'q', a_count)
+        name_offsets, pos = graph_io.buffer_array(buffer, pos, 'q', v_count + 1)
+        table = buffer[pos:pos + n_count]
+
+        graph = cls()
+        graph._names = [str(table[name_offsets[k]:name_offsets[k + 1]], 'utf-8')
+                        for k in range(v_count)]
+        graph._ids = dict(zip(graph._names, range(v_count)))
+        graph._adj = [dict.fromkeys(targets[offsets[k]:offsets[k + 1]]) for k in range(v_count)]
+
+        return graph
+
+
+    @property
+    def adj_list(self) -> 'AdjacencyView':
+        """
+        Return read-only mapping from each vertex name to a dict whose keys
+        are the names of its neighbors
+        """
+        return AdjacencyView(self)
+
+
+    def _intern(self, v: str) -> int:
+        """
+        Return id of vertex v, adding v to the graph if it is not there yet.
+        Ids of removed vertices are reused
+        """
+        i = self._ids.get(v)
+
+        if i is not None:
+            return i
+
+        if len(self._free) > 0:
+            i = self._free.pop()
+            self._names[i] = v
+            self._adj[i] = dict()
+        else:
+            i = len(self._names)
+            self._names.append(v)
+            self._adj.append(dict())
+
+        self._ids[v] = i
+        self._changed()
+
+        # New vertex is a component of its own
+        if self._parent is not None:
+            if i == len(self._parent):
+                self._parent.append(i)
+            else:
+                self._parent[i] = i
+            self._component_count += 1
+
+        return i
+
+
+    def _sorted_neighbors(self, i: int) -> []:
+        """
+        Return neighbor ids of vertex id i in alphabetical order of their
+        names, sorting them only if the adjacency of i changed since the last
+        call
+        """
+        neighbors = self._sorted.get(i)
+
+        if neighbors is None:
+            neighbors = sorted(self._adj[i], key=self._names.__getitem__)
+            self._sorted[i] = neighbors
+
+        return neighbors
+
+
+    def _id_count(self) -> int:
+        """
+        Return number of vertex ids, including ids of removed vertices
+        """
+        return len(self._names)
+
+
+    def _edge_key(self, edge) -> tuple:
+        """
+        Return key of an edge in the change log: its vertices in sorted
+        order, so both orders give the same key
+        """
+        u, v = edge
+        return (u, v) if u <= v else (v, u)
+
+
+    def _current_edge(self, key):
+        """
+        Return key if it names an edge of the graph, otherwise None
+        """
+        i, j = self._ids.get(key[0]), self._ids.get(key[1])
+
+        if i is None or j is None or j not in self._adj[i]:
+            return None
+
+        return key
+
+
+    def _changed(self) -> None:
+        """
+        Record a change to the vertices or edges of the graph
+        """
+        self._version += 1
+
+
+    def _alphabetical_csr(self) -> tuple:
+        """
+        Return a tuple of the vertex names in alphabetical order and CSR
+        offsets and targets arrays over their positions in that order, with
+        the neighbors of each vertex also in alphabetical order
+        """
+        names = sorted(self._ids)
+        position = array('q', [0]) * len(self._names)
+        for k, name in enumerate(names):
+            position[self._ids[name]] = k
+
+        offsets, targets = array('q', [0]), array('q')
+        for name in names:
+            targets.extend(position[j] for j in self._sorted_neighbors(self._ids[name]))
+            offsets.append(len(targets))
+
+        return names, offsets, targets
+
+
+    def freeze(self) -> FrozenGraph:
+        """
+        Return an immutable snapshot of the graph, which any number of
+        threads can read without locks while this graph keeps changing. The
+        snapshot numbers vertices in alphabetical order, so its traversals
+        match dfs() and bfs(). It is also published as the snapshot attribute
+        in a single assignment, and calls without changes in between return
+        the same snapshot
+        """
+        if self.snapshot is None or self.snapshot.version != self._version:
+            names, offsets, targets = self._alphabetical_csr()
+            self.snapshot = FrozenGraph(offsets, targets, names=names,
+                                        cyclic=self.has_cycle(),
+                                        component_count=self.count_connected_components(),
+                                        version=self._version)
+
+        return self.snapshot
+
+
     def add_vertex(self, v: str) -> None:
         """
         Add new vertex to the graph
         """
-        if v in self.adj_list:
-            return
-        
-        self.adj_list[v] = []
+        self._intern(v)
 
 
     def add_edge(self, u: str, v: str) -> None:
@@ -51,76 +338,117 @@ class UndirectedGraph:
         if u == v:
             return
 
-        if u not in self.adj_list:
-            self.add_vertex(u)
+        i, j = self._intern(u), self._intern(v)
 
-        if v not in self.adj_list:
-            self.add_vertex(v)
-
-        if v in self.adj_list[u]:
+        if j in self._adj[i]:
             return
 
-        self.adj_list[u].append(v)
-        self.adj_list[v].append(u)
+        self._adj[i][j] = None
+        self._adj[j][i] = None
+        self._sorted.pop(i, None)
+        self._sorted.pop(j, None)
+        self._union(i, j)
+        self._changed()
+        self._record([(u, v)], [])
         
 
     def remove_edge(self, v: str, u: str) -> None:
         """
         Remove edge from the graph
         """
-        if u not in self.adj_list or v not in self.adj_list:
-            return
+        i, j = self._ids.get(u), self._ids.get(v)
 
-        # Attempt to remove edge from adjacency lists if it exists
-        try:
-            self.adj_list[u].remove(v)
-            self.adj_list[v].remove(u)
-        except ValueError:
+        if i is None or j is None or j not in self._adj[i]:
             return
+
+        del self._adj[i][j]
+        del self._adj[j][i]
+
+        self._sorted.pop(i, None)
+        self._sorted.pop(j, None)
+        self._split()
+        self._changed()
+        self._record([], [(v, u)])
         
 
     def remove_vertex(self, v: str) -> None:
         """
         Remove vertex and all connected edges
         """
-        if v not in self.adj_list:
-            return
+        self.remove_vertices([v])
 
-        # Remove all edges connected to parameterized vertex
-        for vertex in self.adj_list:
-            self.remove_edge(v, vertex)
-        
-        # Remove parameterized vertex from adjacency lists
-        del self.adj_list[v]
+
+    def remove_vertices(self, vertices) -> None:
+        """
+        Remove all provided vertices and their connected edges in a single
+        sweep that only touches the neighbors of removed vertices
+        """
+        removed = {self._ids[v] for v in vertices if v in self._ids}
+
+        if len(removed) > 0:
+            self._split()
+            self._changed()
+
+        # Every edge of removed vertices goes to the change log once
+        lost = []
+
+        for i in removed:
+
+            # Remove edges connected to parameterized vertex from the
+            # adjacency lists of its remaining neighbors
+            for j in self._adj[i]:
+                if j not in removed:
+                    del self._adj[j][i]
+                    self._sorted.pop(j, None)
+
+                if j not in removed or i < j:
+                    lost.append((self._names[i], self._names[j]))
+
+        # Release ids of parameterized vertices
+        for i in removed:
+            del self._ids[self._names[i]]
+            self._names[i] = self._adj[i] = None
+            self._sorted.pop(i, None)
+            self._free.append(i)
+
+        self._record([], lost)
 
 
     def get_vertices(self) -> []:
         """
         Return list of vertices in the graph (any order)
         """
-        res = []
-        
-        for vertex in self.adj_list:
-            res.append(vertex)
-
-        return res
+        return list(self._ids)
        
 
     def get_edges(self) -> []:
         """
         Return list of edges in the graph (any order)
         """
-        res = set()
+        return list(self.iter_edges())
 
-        for vertex_1 in self.adj_list:
 
-            for vertex_2 in self.adj_list[vertex_1]:
+    def iter_edges(self):
+        """
+        Generator version of get_edges. Yield each edge once, as a tuple of
+        two vertices, without building the whole edge set
+        """
+        names = self._names
+        done, stamp = self._take_marks()
 
-                # Check whether permutation of vertices was already accounted for
-                if (vertex_2, vertex_1) not in res:
-                    res.add((vertex_1, vertex_2))
-        
-        return list(res)
+        try:
+            for vertex_1, i in self._ids.items():
+
+                # Edges to vertices already processed were yielded from the
+                # other end
+                for j in self._adj[i]:
+                    if done[j] != stamp:
+                        yield vertex_1, names[j]
+
+                done[i] = stamp
+
+        finally:
+            self._give_marks(done, stamp)
 
         
     def is_valid_path(self, path: []) -> bool:
@@ -132,11 +460,11 @@ class UndirectedGraph:
 
         for vertex in path:
 
-            if vertex not in self.adj_list:
+            if vertex not in self._ids:
                 return False
 
             # Check if edge exists from last visited vertex to current vertex
-            if last_visited and vertex not in self.adj_list[last_visited]:
+            if last_visited and self._ids[vertex] not in self._adj[self._ids[last_visited]]:
                 return False
 
             # Update last visited vertex
@@ -150,38 +478,55 @@ class UndirectedGraph:
         Return list of vertices visited during DFS search
         Vertices are picked in alphabetical order
         """
-        path = []
+        return list(self._cached(('dfs', v_start, v_end),
+                                 lambda: list(self.iter_dfs(v_start, v_end))))
 
-        if v_start not in self.adj_list:
-            return path
 
-        # Use a stack ADT to store neighboring vertices
-        stack = deque()
-        visited = set()
+    def iter_dfs(self, v_start, v_end=None):
+        """
+        Generator version of dfs. Yield vertices in the order they are
+        visited, so callers can stop after the first few
+        """
+        if v_start not in self._ids:
+            return
 
-        stack.append(v_start)
+        start, end = self._ids[v_start], self._ids.get(v_end, -1)
+        names = self._names
+        visited, stamp = self._take_marks()
 
-        while len(stack) > 0:
+        try:
+            visited[start] = stamp
+            yield v_start
 
-            current = stack.pop()
+            if start == end:
+                return
 
-            if current == v_end:
-                path.append(current)
-                break
+            # Use a stack of neighbor iterators for the vertices on the
+            # current path, so each vertex enters the stack only once.
+            # Neighbors are taken in alphabetical order
+            stack = [iter(self._sorted_neighbors(start))]
+
+            while len(stack) > 0:
+
+                for i in stack[-1]:
 
-            if current not in visited:
-                visited.add(current)
-                path.append(current)
+                    if visited[i] != stamp:
+                        visited[i] = stamp
+                        yield names[i]
 
-                # Sort adjacency list in reverse-lexicographical order so that
-                # vertices at the beginning of the alphabet are at the top of
-                # the stack
-                self.adj_list[current].sort(reverse=True)
+                        if i == end:
+                            return
 
-                for vertex in self.adj_list[current]:
-                    stack.append(vertex)
+                        # Resume the current vertex's neighbors once the new
+                        # vertex has been processed
+                        stack.append(iter(self._sorted_neighbors(i)))
+                        break
 
-        return path
+                else:
+                    stack.pop()
+
+        finally:
+            self._give_marks(visited, stamp)
 
 
     def bfs(self, v_start, v_end=None) -> []:
@@ -189,101 +534,260 @@ class UndirectedGraph:
         Return list of vertices visited during BFS search
         Vertices are picked in alphabetical order
         """
-        path = []
-
-        if v_start not in self.adj_list:
-            return path
+        return list(self._cached(('bfs', v_start, v_end),
+                                 lambda: list(self.iter_bfs(v_start, v_end))))
 
-        # Use a queue ADT to store neighboring vertices
-        queue = deque()
-        visited = set()
 
-        queue.append(v_start)
+    def iter_bfs(self, v_start, v_end=None):
+        """
+        Generator version of bfs. Yield vertices in the order they are
+        visited, so callers can stop after the first few
+        """
+        if v_start not in self._ids:
+            return
 
-        while len(queue) > 0:
+        start, end = self._ids[v_start], self._ids.get(v_end, -1)
+        names = self._names
+        visited, stamp = self._take_marks()
 
-            current = queue.popleft()
+        try:
+            # Use a queue ADT to store neighboring vertices. Vertices are
+            # marked when enqueued, so each one is enqueued only once
+            queue = deque()
+            queue.append(start)
+            visited[start] = stamp
 
-            if current == v_end:
-                path.append(current)
-                break
+            while len(queue) > 0:
 
-            if current not in visited:
-                visited.add(current)
-                path.append(current)
+                current = queue.popleft()
+                yield names[current]
 
-                self.adj_list[current].sort()
+                if current == end:
+                    return
 
-                for vertex in self.adj_list[current]:
-                    queue.append(vertex)
+                for i in self._sorted_neighbors(current):
+                    if visited[i] != stamp:
+                        visited[i] = stamp
+                        queue.append(i)
 
-        return path
+        finally:
+            self._give_marks(visited, stamp)
         
 
+    def batch_query(self, kind: str, sources, workers=None):
+        """
+        Generator. Run bfs() or dfs() from every vertex in sources, as
+        selected by kind, on a pool of worker processes (one per CPU by
+        default) that share an integer copy of the adjacency through shared
+        memory. Yield (source, result) tuples in the order they complete
+        """
+        if kind not in ('bfs', 'dfs'):
+            raise ValueError(f'unknown query kind {kind!r}')
+
+        sources = list(sources)
+
+        # Sources not in the graph are answered locally
+        for v in sources:
+            if v not in self._ids:
+                yield v, []
+
+        # Renumber vertices in alphabetical order so that ascending indices
+        # give the traversal order the graph promises
+        names, offsets, targets = self._alphabetical_csr()
+        index = {name: k for k, name in enumerate(names)}
+
+        results = graph_kernels.batch({'offsets': offsets, 'targets': targets}, kind,
+                                      [index[v] for v in sources if v in self._ids],
+                                      workers or os.cpu_count() or 1)
+
+        for src, path in results:
+            yield names[src], [names[k] for k in path]
+
+
     def count_connected_components(self):
         """
         Return number of connected components in the graph
         """
-        vertices = set(self.adj_list.keys())
+        if self._parent is None:
+            self._rebuild_index()
+
+        return self._component_count
+
+
+    def component_of(self, v: str):
+        """
+        Return representative vertex of the connected component containing v,
+        or None if v is not in the graph. All vertices of a component share
+        the same representative until the graph is next modified
+        """
+        if v not in self._ids:
+            return None
 
-        connected_count = 0
+        if self._parent is None:
+            self._rebuild_index()
 
-        while len(vertices) > 0:
-            
-            vertex = vertices.pop()
+        return self._names[self._find(self._ids[v])]
 
-            # Perform DFS to return a set of all components connected to
-            # a given vertex
-            connected = set(self.dfs(vertex))
-            
-            # Remove the connected components from the set of unvisited vertices
-            vertices -= connected
-            connected_count += 1
 
-        return connected_count
+    def same_component(self, u: str, v: str) -> bool:
+        """
+        Return True if u and v are in the graph and connected by a path,
+        False otherwise
+        """
+        if u not in self._ids or v not in self._ids:
+            return False
+
+        return self.component_of(u) == self.component_of(v)
 
 
     def has_cycle(self):
         """
-        Return True if graph contains a cycle, False otherwise
+        Return True if graph contains a cycle, False otherwise. The answer is
+        maintained across edge insertions, so repeated calls do not traverse
+        the graph again until an edge or vertex is removed.
         """
-        unvisited = {vertex for vertex in self.adj_list}
-        visited = set()
+        if self._cyclic is None:
+            self._rebuild_index()
 
-        # Test every unvisited vertex
-        while len(unvisited) > 0:
+        return self._cyclic
 
-            vertex = unvisited.pop()
 
-            if self.has_cycle_rec(vertex, unvisited, visited):
-                return True
-        
-        return False
+    def _rebuild_index(self) -> None:
+        """
+        Recompute cycle flag, union-find parent ids and component count from
+        scratch
+        """
+        # Maps each visited vertex id to the id its DFS started from, which
+        # doubles as a flat union-find forest. Unvisited ids hold -1
+        parent = array('q', [-1]) * len(self._names)
 
+        self._cyclic = False
+        self._component_count = 0
 
-    def has_cycle_rec(self, vertex, unvisited, visited, last_visited=None):
+        # Traverse from every unvisited vertex; each traversal covers one
+        # connected component
+        for i in self._ids.values():
+
+            if parent[i] == -1:
+                self._component_count += 1
+
+                if self._cycle_search(i, parent):
+                    self._cyclic = True
+
+        self._parent = parent
+
+
+    def _cycle_search(self, vertex, parent) -> bool:
         """
-        Recursive helper method for has_cycle
+        Helper method for _rebuild_index. Visits every vertex connected to
+        vertex and returns True if there is a cycle among them. Uses an
+        explicit stack instead of recursion so that long paths do not hit the
+        recursion limit
         """
-        # Move vertex from set of unvisited to visited vertices
-        unvisited.discard(vertex)
-        visited.add(vertex)
+        # Mark vertex as visited, recording the root of its DFS tree
+        parent[vertex] = vertex
+
+        cycle = False
+
+        # Each entry holds a vertex, the vertex it was reached from, and an
+        # iterator over its remaining neighbors
+        stack = [(vertex, -1, iter(self._adj[vertex]))]
 
-        for neighbor in self.adj_list[vertex]:
-            
-            # Base case: If the neighboring vertex has already been visited and
-            # it is not the parent vertex, then there is a cycle
-            if neighbor in visited and neighbor != last_visited:
-                return True
+        while len(stack) > 0:
+
+            current, last_visited, neighbors = stack[-1]
+
+            for neighbor in neighbors:
+
+                # If the neighboring vertex has already been visited and it is
+                # not the parent vertex, then there is a cycle
+                if parent[neighbor] != -1:
+                    if neighbor != last_visited:
+                        cycle = True
+                    continue
+
+                # Visit the neighboring vertex, resuming the current vertex's
+                # neighbors once it has been processed
+                parent[neighbor] = vertex
+                stack.append((neighbor, current, iter(self._adj[neighbor])))
+                break
 
-            # Recursive case: check whether there is a cycle at the neighboring
-            # vertex
-            if neighbor not in visited:
-                if self.has_cycle_rec(neighbor, unvisited, visited, vertex):
-                    return True
+            else:
+                stack.pop()
+
+        return cycle
+
+
+    def _find(self, i: int) -> int:
+        """
+        Return root of the union-find tree containing vertex id i, halving
+        the path along the way
+        """
+        parent = self._parent
+
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+
+        return i
+
+
+    def _union(self, i: int, j: int) -> None:
+        """
+        Update cycle flag and union-find forest for a new edge between vertex
+        ids i and j
+        """
+        # Without a forest, the new edge can only be classified if the graph
+        # already has a cycle
+        if self._parent is None:
+            if self._cyclic is False:
+                self._cyclic = None
+            return
 
-        # Base case: If vertex has no neighbors to process, there is no cycle
-        return False
+        root_i, root_j = self._find(i), self._find(j)
+
+        # Edge within a single tree closes a cycle, any other edge merges
+        # two components
+        if root_i == root_j:
+            self._cyclic = True
+        else:
+            self._parent[root_i] = root_j
+            self._component_count -= 1
+
+
+    def _split(self) -> None:
+        """
+        Invalidate union-find forest after an edge or vertex removal. A forest
+        stays acyclic, but a removal may break the last cycle of the graph
+        """
+        self._parent = None
+
+        if self._cyclic is True:
+            self._cyclic = None
+
+
+class AdjacencyView(Mapping):
+    """
+    Read-only view of an UndirectedGraph as a mapping from vertex names to
+    dicts of neighbor names, as the graph was stored before its vertex names
+    were interned. Neighbor dicts are built on access
+    """
+
+    def __init__(self, graph: UndirectedGraph):
+        self._graph = graph
+
+    def __getitem__(self, v: str) -> dict:
+        graph = self._graph
+        return dict.fromkeys(graph._names[j] for j in graph._adj[graph._ids[v]])
+
+    def __contains__(self, v) -> bool:
+        return v in self._graph._ids
+
+    def __iter__(self):
+        return iter(self._graph._ids)
+
+    def __len__(self) -> int:
+        return len(self._graph._ids)
 
 
 
@@ -378,3 +882,28 @@ if __name__ == '__main__':
         u, v = edge
         g.add_edge(u, v) if command == 'add' else g.remove_edge(u, v)
         print('{:<10}'.format(case), g.has_cycle())
+
+
+    print("\nmethod component_of() / same_component() example 1")
+    print("--------------------------------------------------------")
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = UndirectedGraph(edges)
+    for u, v in ['AH', 'AG', 'FQ']:
+        print(u, v, g.same_component(u, v))
+    print(g.component_of('F') == g.component_of('Q'))
+
+
+    print("\nsave() / load() round trip example 1")
+    print("--------------------------------------")
+    import tempfile
+
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'graph.bin')
+        UndirectedGraph(edges).save(path)
+
+        # Save a graph mapped from the file back over the same file
+        g = UndirectedGraph.load(path)
+        g.add_edge('A', 'Q')
+        g.save(path)
+        print(g.get_edges() == UndirectedGraph.load(path).get_edges())